@@ -0,0 +1,77 @@
+"""
+Microbenchmarks for the page pipeline stages on the benchmark corpus.
+
+Times content-div lookup, reference extraction and text extraction for each
+HTML engine, then Article construction, Page rendering and JSON serialization,
+for every page size in the corpus. Reports the median and best time per call.
+
+    python benchmarks/bench_pipeline.py [--repeat 7] [--compare results/pipeline-....json]
+"""
+import argparse
+import os
+import statistics
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+os.environ.setdefault("PARSE_POOL", "inline")
+
+from bs4 import BeautifulSoup
+
+from corpus import load_corpus
+from extraction import ENGINES, find_content_div, parse_html
+from main import build_article, extract_references, render_page, serialize_article
+from reporting import compare, load_results, save_results
+
+URL = "https://grokipedia.com/page/Benchmark"
+
+
+def measure(fn, repeat: int) -> dict:
+    """Median and best milliseconds per call, auto-scaling the loop count to ~0.2s per repeat"""
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    times = [t / number * 1000 for t in timer.repeat(repeat=repeat, number=number)]
+    return {"median_ms": statistics.median(times), "best_ms": min(times)}
+
+
+def cases(html: str):
+    soup = BeautifulSoup(html, "html.parser")
+    parsed = parse_html(html, "Benchmark")
+    article = build_article(parsed, "Benchmark", URL)
+    page = render_page(article, extract_refs=True, truncate=None, citations=False)
+
+    yield "find_content_div", lambda: find_content_div(soup)
+    yield "extract_references", lambda: extract_references(soup)
+    for engine in ENGINES:
+        yield f"parse[{engine}]", lambda engine=engine: parse_html(html, "Benchmark", engine)
+    yield "build_article", lambda: build_article(parsed, "Benchmark", URL)
+    yield "render_page", lambda: render_page(article, extract_refs=True, truncate=None, citations=False)
+    yield "render_page[truncate]", lambda: render_page(article, extract_refs=False, truncate=1000, citations=False)
+    yield "page_json", lambda: page.model_dump_json()
+    yield "serialize_article", lambda: serialize_article(article)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--compare", help="earlier pipeline results file to compare against")
+    parser.add_argument("--no-save", action="store_true", help="don't write a results file")
+    args = parser.parse_args()
+
+    results = {}
+    print(f"{'case':<36} {'median ms':>10} {'best ms':>10}")
+    for size, html in load_corpus().items():
+        for name, fn in cases(html):
+            key = f"{size}/{name}"
+            results[key] = measure(fn, args.repeat)
+            print(f"{key:<36} {results[key]['median_ms']:>10.3f} {results[key]['best_ms']:>10.3f}")
+
+    if not args.no_save:
+        print(f"\nSaved {save_results('pipeline', results, vars(args))}")
+    if args.compare:
+        compare(results, load_results(args.compare))
+
+
+if __name__ == "__main__":
+    main()
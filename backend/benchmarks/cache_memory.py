@@ -0,0 +1,117 @@
+"""
+Memory per cached article: the previous pydantic representation vs the compact one.
+
+For each corpus page size, builds ``--copies`` distinct articles in each
+representation and reports traced memory per article, the size the page
+cache charges against its byte budget, how many articles fit in
+``--budget`` bytes, and the cost of reading ``content_text`` back (paid once
+per rendered view).
+
+    python benchmarks/cache_memory.py [--copies 50] [--budget 52428800]
+"""
+import argparse
+import os
+import sys
+import timeit
+import tracemalloc
+from pathlib import Path
+from typing import List, Optional
+from unittest.mock import patch
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+os.environ.setdefault("PARSE_POOL", "inline")
+
+from pydantic import BaseModel
+
+import main as api
+from corpus import load_corpus
+from extraction import parse_html
+from main import Article, Reference
+from reporting import compare, load_results, save_results
+
+
+class LegacyArticle(BaseModel):
+    """The cached form before articles were packed"""
+    title: str
+    slug: str
+    url: str
+    content_text: str
+    references: List[Reference] = []
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+
+def legacy_sizeof(obj, seen=None) -> int:
+    """How the cache used to charge an article: a recursive getsizeof walk"""
+    size = sys.getsizeof(obj)
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    if isinstance(obj, dict):
+        size += sum(legacy_sizeof(k, seen) + legacy_sizeof(v, seen) for k, v in obj.items())
+    elif hasattr(obj, "__dict__"):
+        size += legacy_sizeof(obj.__dict__, seen)
+    if hasattr(obj, "__iter__") and not isinstance(obj, (str, bytes, tuple)):
+        size += sum(legacy_sizeof(item, seen) for item in obj)
+    return size
+
+
+def build(representation: str, parsed, copy: int):
+    # Fresh strings per copy, as separately fetched pages would have
+    text = f"{parsed.content_text} {copy}"
+    urls = [f"{url}#{copy}" for url in parsed.reference_urls]
+    if representation == "legacy":
+        references = [Reference(number=i, url=url) for i, url in enumerate(urls, 1)]
+        return LegacyArticle(title=parsed.title, slug="Benchmark", url=api.BASE_URL, content_text=text,
+                             references=references)
+    with patch.object(api, "CACHE_COMPRESS_TEXT", representation == "compact+zlib"):
+        return Article(title=parsed.title, slug="Benchmark", url=api.BASE_URL, content_text=text,
+                       reference_urls=urls)
+
+
+def measure(representation: str, parsed, copies: int, budget: int) -> dict:
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    articles = [build(representation, parsed, copy) for copy in range(copies)]
+    traced = (tracemalloc.get_traced_memory()[0] - before) / copies
+    tracemalloc.stop()
+
+    sample = articles[0]
+    accounted = legacy_sizeof(sample) if representation == "legacy" else sample.nbytes()
+    read = timeit.Timer(lambda: sample.content_text)
+    number, _ = read.autorange()
+    return {
+        "bytes": traced,
+        "accounted": accounted,
+        "per_budget": budget // accounted,
+        "read_ms": min(read.repeat(repeat=5, number=number)) / number * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--copies", type=int, default=50, help="articles built per size and representation")
+    parser.add_argument("--budget", type=int, default=api.MAX_CACHE_BYTES, help="cache byte budget")
+    parser.add_argument("--compare", help="earlier cache-memory results file to compare against")
+    parser.add_argument("--no-save", action="store_true", help="don't write a results file")
+    args = parser.parse_args()
+
+    results = {}
+    print(f"{'case':<28} {'traced KiB':>11} {'charged KiB':>12} {'per budget':>11} {'read ms':>8}")
+    for size, html in load_corpus().items():
+        parsed = parse_html(html, "Benchmark", "bs4")
+        for representation in ("legacy", "compact", "compact+zlib"):
+            key = f"{size}/{representation}"
+            result = results[key] = measure(representation, parsed, args.copies, args.budget)
+            print(f"{key:<28} {result['bytes'] / 1024:>11.1f} {result['accounted'] / 1024:>12.1f} "
+                  f"{result['per_budget']:>11} {result['read_ms']:>8.3f}")
+
+    if not args.no_save:
+        print(f"\nSaved {save_results('cache-memory', results, vars(args))}")
+    if args.compare:
+        compare(results, load_results(args.compare))
+
+
+if __name__ == "__main__":
+    main()
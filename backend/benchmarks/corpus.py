@@ -0,0 +1,89 @@
+"""
+Benchmark corpus: saved Grokipedia-layout pages of increasing size.
+
+``small`` and ``median`` are the recorded fixtures used by the parity tests;
+``huge`` is generated deterministically in the same layout (long article,
+1500 references), so the repository doesn't have to carry a multi-megabyte
+page. Sizes are fixed by the seed and the parameters below, so runs stay
+comparable.
+"""
+import random
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict
+
+FIXTURES = Path(__file__).parent.parent / "tests" / "fixtures" / "grokipedia"
+
+HUGE_SECTIONS = 120
+HUGE_PARAGRAPHS_PER_SECTION = 6
+HUGE_REFERENCES = 1500
+
+_WORDS = (
+    "river basin trade century climate engineers political regional studies rail networks "
+    "migration reform agriculture hydroelectric decline expansion variability scholars "
+    "development causes plateau centre surveyed emphasise disagree late first recent across"
+).split()
+
+_REFERENCE_TEMPLATES = (
+    '<a href="https://www.example-journal.org/articles/topic-{n}">Journal article {n}</a>',
+    '<a href="#cite-ref-{n}">^</a> <a href="https://doi.org/10.1000/{n}">doi:10.1000/{n}</a>',
+    '<a href="//cdn.example.net/papers/{n}.pdf">PDF</a>',
+    '<a href="/page/Source_{n}">Internal</a> <a href="https://books.example.com/id/{n}">Book</a>',
+    'Anonymous ({year}). <i>Untitled report</i>.',
+)
+
+
+def _sentence(rng: random.Random) -> str:
+    words = [rng.choice(_WORDS) for _ in range(rng.randint(8, 22))]
+    return " ".join(words).capitalize() + "."
+
+
+def generate_page(title: str, sections: int, paragraphs: int, references: int, seed: int = 0) -> str:
+    """Article HTML in Grokipedia's layout with citations spread over the text"""
+    rng = random.Random(seed)
+    parts = [
+        "<!DOCTYPE html>\n<html lang=\"en\">\n<head><meta charset=\"utf-8\">",
+        f"<title>{title} - Grokipedia</title>",
+        "<script>self.__next_f = self.__next_f || []; self.__next_f.push([0]);</script></head>",
+        "<body class=\"antialiased\">",
+        "<header class=\"sticky top-0\"><nav><a href=\"/\">Grokipedia</a></nav></header>",
+        "<div class=\"flex\"><aside class=\"toc\"><ul>",
+        *(f"<li><a href=\"#section-{i}\">Section {i}</a></li>" for i in range(sections)),
+        "</ul></aside><main class=\"flex-1\"><article class=\"prose prose-lg max-w-none\">",
+        f"<h1>{title}</h1>",
+    ]
+    for section in range(sections):
+        parts.append(f"<h2 id=\"section-{section}\">Section {section}</h2>")
+        for _ in range(paragraphs):
+            sentences = []
+            for _ in range(rng.randint(3, 7)):
+                sentence = _sentence(rng)
+                if rng.random() < 0.4:
+                    n = rng.randint(1, references)
+                    sentence += f"<sup><a href=\"#cite-note-{n}\">[{n}]</a></sup>"
+                sentences.append(sentence)
+            parts.append(f"<p>{' '.join(sentences)}</p>")
+    parts.append("</article><div id=\"references\"><h2>References</h2><ol>")
+    for n in range(1, references + 1):
+        template = _REFERENCE_TEMPLATES[n % len(_REFERENCE_TEMPLATES)]
+        parts.append(f"<li id=\"cite-note-{n}\">{template.format(n=n, year=1900 + n % 120)}</li>")
+    parts.append("</ol></div></main></div>")
+    parts.append("<footer class=\"border-t\"><p>Grokipedia</p></footer></body></html>")
+    return "\n".join(parts)
+
+
+@lru_cache(maxsize=None)
+def load_corpus() -> Dict[str, str]:
+    """Page size name -> HTML"""
+    return {
+        "small": (FIXTURES / "small_stub.html").read_text(encoding="utf-8"),
+        "median": (FIXTURES / "typical_article.html").read_text(encoding="utf-8"),
+        "huge": generate_page(
+            "Huge Article", HUGE_SECTIONS, HUGE_PARAGRAPHS_PER_SECTION, HUGE_REFERENCES, seed=18
+        ),
+    }
+
+
+if __name__ == "__main__":
+    for name, html in load_corpus().items():
+        print(f"{name:>7}: {len(html.encode('utf-8')):>9,} bytes")
@@ -0,0 +1,173 @@
+"""
+End-to-end load test: the API under uvicorn against a local stand-in upstream.
+
+Starts benchmarks/upstream_server.py and the API (``uvicorn main:app``) as
+subprocesses, then for each concurrency level sends ``--requests`` GETs to
+/page/<slug>, drawing slugs from a pool of ``--slugs`` per level so the first
+request for each slug misses the cache and the rest hit. Reports req/s and
+p50/p99 latency per level and stores them for later comparison.
+
+    python benchmarks/load_test.py [--concurrency 1,8,32,128] [--requests 2000] [--slugs 200]
+                                   [--mix small=0.6,median=0.35,huge=0.05] [--latency-ms 50]
+                                   [--workers 1] [--compare results/load-....json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).parent))
+from reporting import compare, load_results, save_results
+
+BACKEND_DIR = Path(__file__).parent.parent
+BENCH_KEY = "benchmark-key"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextmanager
+def serve(command: List[str], env: Dict[str, str], ready_url: str, log_path: Path):
+    """Run ``command`` until the block exits, once ``ready_url`` answers"""
+    with open(log_path, "w") as log:
+        process = subprocess.Popen(command, cwd=BACKEND_DIR, env={**os.environ, **env}, stdout=log, stderr=log)
+        try:
+            deadline = time.monotonic() + 30
+            while True:
+                if process.poll() is not None:
+                    raise RuntimeError(f"{command[0]} exited early; see {log_path}")
+                try:
+                    httpx.get(ready_url, timeout=1)
+                    break
+                except httpx.HTTPError:
+                    if time.monotonic() > deadline:
+                        raise RuntimeError(f"Timed out waiting for {ready_url}; see {log_path}")
+                    time.sleep(0.2)
+            yield
+        finally:
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+def parse_mix(value: str) -> Dict[str, float]:
+    mix = {}
+    for part in value.split(","):
+        size, weight = part.split("=")
+        mix[size.strip()] = float(weight)
+    return mix
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+async def run_level(base_url: str, concurrency: int, slugs: List[str], requests: int, seed: int) -> Dict[str, float]:
+    rng = random.Random(seed)
+    paths = [f"/page/{rng.choice(slugs)}" for _ in range(requests)]
+    queue = iter(paths)
+    latencies: List[float] = []
+    errors = 0
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, headers={"X-API-Key": BENCH_KEY},
+                                 limits=limits, timeout=60) as client:
+        async def worker():
+            nonlocal errors
+            for path in queue:
+                start = time.perf_counter()
+                try:
+                    response = await client.get(path)
+                    await response.aread()
+                    ok = response.status_code == 200
+                except httpx.HTTPError:
+                    ok = False
+                latencies.append(time.perf_counter() - start)
+                errors += not ok
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "rps": requests / elapsed,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "mean_ms": statistics.fmean(latencies) * 1000,
+        "errors": errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--concurrency", default="1,8,32,128", help="comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=2000, help="requests per level")
+    parser.add_argument("--slugs", type=int, default=200, help="distinct slugs per level (misses)")
+    parser.add_argument("--mix", default="small=0.6,median=0.35,huge=0.05", help="page size weights")
+    parser.add_argument("--latency-ms", type=float, default=50, help="simulated upstream latency")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--seed", type=int, default=18)
+    parser.add_argument("--compare", help="earlier load results file to compare against")
+    parser.add_argument("--no-save", action="store_true", help="don't write a results file")
+    args = parser.parse_args()
+
+    levels = [int(level) for level in args.concurrency.split(",")]
+    mix = parse_mix(args.mix)
+    upstream_port, api_port = free_port(), free_port()
+    upstream_url = f"http://127.0.0.1:{upstream_port}"
+    api_url = f"http://127.0.0.1:{api_port}"
+    api_env = {
+        "UPSTREAM_BASE_URL": upstream_url,
+        "UPSTREAM_HTTP2": "false",
+        "API_SECRET_KEY": "unused-in-benchmark",
+        "HEALTH_SECRET": "benchmark-health",
+        # One key with limits far above what the test sends
+        "API_KEYS": json.dumps([{"name": "benchmark", "key": BENCH_KEY, "rate_limit": 10**9}]),
+    }
+    log_dir = Path(__file__).parent / "results"
+    log_dir.mkdir(exist_ok=True)
+
+    upstream = [sys.executable, str(Path(__file__).parent / "upstream_server.py"),
+                "--port", str(upstream_port), "--latency-ms", str(args.latency_ms)]
+    api = [sys.executable, "-m", "uvicorn", "main:app", "--port", str(api_port),
+           "--workers", str(args.workers), "--log-level", "warning"]
+
+    results = {}
+    with serve(upstream, {}, f"{upstream_url}/page/none", log_dir / "upstream.log"), \
+            serve(api, api_env, f"{api_url}/health?key=benchmark-health", log_dir / "api.log"):
+        print(f"{'concurrency':>11} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'errors':>7}")
+        for level in levels:
+            rng = random.Random(args.seed + level)
+            sizes = rng.choices(list(mix), weights=list(mix.values()), k=args.slugs)
+            slugs = [f"{size}_c{level}_{i}" for i, size in enumerate(sizes)]
+            result = asyncio.run(run_level(api_url, level, slugs, args.requests, args.seed + level))
+            results[f"concurrency={level}"] = result
+            print(f"{level:>11} {result['rps']:>9.1f} {result['p50_ms']:>9.1f} "
+                  f"{result['p99_ms']:>9.1f} {result['errors']:>7}")
+
+    if not args.no_save:
+        print(f"\nSaved {save_results('load', results, vars(args))}")
+    if args.compare:
+        compare(results, load_results(args.compare))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Memory and per-request cost of the rate limiter under many distinct clients.
+
+Feeds requests from N distinct IPs (default 1,000,000) through
+SlidingWindowLimiter, advancing a simulated clock, and reports traced memory
+and tracked clients at checkpoints (per-request timings include tracemalloc
+overhead). Memory should level off once the client cap (or the idle horizon)
+is reached instead of growing with N.
+
+    python benchmarks/rate_limiter_memory.py [--clients 1000000] [--max-clients 100000] [--rps 2000]
+"""
+import argparse
+import ipaddress
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from rate_limit import SlidingWindowLimiter
+
+
+class SimulatedClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--clients", type=int, default=1_000_000, help="distinct client IPs to send")
+    parser.add_argument("--max-clients", type=int, default=100_000, help="limiter client cap")
+    parser.add_argument("--rps", type=float, default=2000, help="simulated requests per second")
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--window", type=float, default=60)
+    args = parser.parse_args()
+
+    clock = SimulatedClock()
+    limiter = SlidingWindowLimiter(args.limit, args.window, max_clients=args.max_clients, clock=clock)
+    first_ip = int(ipaddress.IPv4Address("10.0.0.0"))
+    ips = [str(ipaddress.IPv4Address(first_ip + i)) for i in range(args.clients)]  # Allocated before tracing
+
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    checkpoint = max(1, args.clients // 10)
+    print(f"{'requests':>10} {'tracked':>9} {'memory MiB':>11} {'peak MiB':>9} {'ns/request':>11}")
+    started = time.perf_counter()
+    for i, ip in enumerate(ips, 1):
+        clock.now += 1 / args.rps
+        limiter.hit(ip)
+        if i % checkpoint == 0:
+            elapsed = time.perf_counter() - started
+            current, peak = tracemalloc.get_traced_memory()
+            print(f"{i:>10} {len(limiter):>9} {(current - baseline) / 2**20:>11.1f} "
+                  f"{(peak - baseline) / 2**20:>9.1f} {elapsed / checkpoint * 1e9:>11.0f}")
+            started = time.perf_counter()
+    tracemalloc.stop()
+    print(limiter.stats())
+
+
+if __name__ == "__main__":
+    main()
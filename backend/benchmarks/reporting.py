@@ -0,0 +1,67 @@
+"""
+Storing benchmark results and comparing them with an earlier run.
+
+Each run is written to ``benchmarks/results/<suite>-<timestamp>.json`` with
+the interpreter and host it ran on. ``compare`` prints the relative change of
+every metric present in both runs.
+"""
+import json
+import os
+import platform
+import subprocess
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Optional
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+# Metrics where a higher value is better; everything else (times, bytes) is lower-is-better
+HIGHER_IS_BETTER = ("rps", "per_budget")
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=Path(__file__).parent,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def save_results(suite: str, results: Dict[str, Dict[str, float]], params: Dict) -> Path:
+    """Write ``{case: {metric: value}}`` for ``suite``; returns the file path"""
+    RESULTS_DIR.mkdir(exist_ok=True)
+    now = datetime.now(timezone.utc)
+    path = RESULTS_DIR / f"{suite}-{now.strftime('%Y%m%dT%H%M%SZ')}.json"
+    document = {
+        "suite": suite,
+        "created_at": now.isoformat(),
+        "revision": _git_revision(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "params": params,
+        "results": results,
+    }
+    path.write_text(json.dumps(document, indent=2) + "\n")
+    return path
+
+
+def load_results(path: str) -> Dict[str, Dict[str, float]]:
+    return json.loads(Path(path).read_text())["results"]
+
+
+def compare(current: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]]):
+    """Print each shared metric with its change against ``baseline``; regressions are flagged"""
+    print(f"\n{'case':<36} {'metric':<10} {'baseline':>12} {'current':>12} {'change':>9}")
+    for case, metrics in current.items():
+        for metric, value in metrics.items():
+            old = baseline.get(case, {}).get(metric)
+            if old is None or not old:
+                continue
+            change = (value - old) / old
+            worse = change < 0 if metric in HIGHER_IS_BETTER else change > 0
+            flag = "  <- regression" if worse and abs(change) >= 0.10 else ""
+            print(f"{case:<36} {metric:<10} {old:>12.3f} {value:>12.3f} {change:>+8.1%}{flag}")
@@ -0,0 +1,48 @@
+"""
+Local stand-in for grokipedia.com serving the benchmark corpus.
+
+``GET /page/<size>_<anything>`` returns the corpus page of that size
+(small, median or huge) after an optional simulated network latency; any
+other slug is a 404.
+
+    python benchmarks/upstream_server.py [--port 8765] [--latency-ms 50]
+"""
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.responses import HTMLResponse, PlainTextResponse
+from starlette.routing import Route
+
+sys.path.insert(0, str(Path(__file__).parent))
+from corpus import load_corpus
+
+
+def create_app(latency_ms: float = 0) -> Starlette:
+    pages = {size: html.encode("utf-8") for size, html in load_corpus().items()}
+
+    async def page(request):
+        if latency_ms:
+            await asyncio.sleep(latency_ms / 1000)
+        size = request.path_params["slug"].split("_", 1)[0]
+        if size not in pages:
+            return PlainTextResponse("Not found", status_code=404)
+        return HTMLResponse(pages[size])
+
+    return Starlette(routes=[Route("/page/{slug:path}", page)])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=50, help="simulated upstream latency")
+    args = parser.parse_args()
+    uvicorn.run(create_app(args.latency_ms), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,328 @@
+"""
+Page cache engine: O(1) LRU ordering, per-entry TTL and byte-budget eviction,
+plus an optional file-backed second tier shared between worker processes and
+a binary snapshot format for carrying a cache across restarts.
+"""
+import mmap
+import os
+import sqlite3
+import struct
+import sys
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import IO, Any, Callable, Dict, Hashable, Iterable, Iterator, NamedTuple, Optional, Tuple
+
+
+class CacheEntry:
+    __slots__ = ("value", "stored_at", "size", "hits", "refresh_failed_at")
+
+    def __init__(self, value: Any, stored_at: float, size: int):
+        self.value = value
+        self.stored_at = stored_at  # Epoch seconds the value was fetched
+        self.size = size  # Accounted bytes
+        self.hits = 0  # Reads served from this entry
+        self.refresh_failed_at = 0.0  # Epoch seconds a background refresh of this value last failed
+
+
+class LRUCache:
+    """Least-recently-used cache bounded by total bytes rather than entry count.
+
+    Sizes are measured once with ``sizeof`` on insert and tracked incrementally,
+    so eviction and size reporting never walk the stored values. Entries older
+    than ``ttl`` seconds are treated as misses. With ``stale_ttl`` they are kept
+    that much longer and still returned to callers that ask for stale data
+    (stale-while-revalidate); past ``ttl + stale_ttl`` they are dropped.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int,
+        ttl: float,
+        sizeof: Callable[[Any], int] = sys.getsizeof,
+        clock: Callable[[], float] = time.time,
+        stale_ttl: float = 0,
+    ):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.sizeof = sizeof
+        self.clock = clock
+        self._entries: "OrderedDict[Hashable, CacheEntry]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.stale_hits = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def __iter__(self) -> Iterator[Hashable]:
+        return iter(self._entries)
+
+    def keys(self):
+        return self._entries.keys()
+
+    def items(self):
+        """``(key, CacheEntry)`` pairs, least recently used first"""
+        return self._entries.items()
+
+    @property
+    def total_bytes(self) -> int:
+        return self._bytes
+
+    def age(self, entry: CacheEntry) -> float:
+        return self.clock() - entry.stored_at
+
+    def is_stale(self, entry: CacheEntry) -> bool:
+        return self.age(entry) > self.ttl
+
+    def get_entry(self, key: Hashable, allow_stale: bool = False) -> Optional[CacheEntry]:
+        """Return the entry for ``key`` (marking it recently used), or None.
+
+        Expired entries are only returned with ``allow_stale`` and while within
+        the stale grace period.
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        age = self.age(entry)
+        if age > self.ttl + self.stale_ttl:
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
+            return None
+        if age > self.ttl:
+            if not allow_stale:
+                self.misses += 1
+                return None
+            self.stale_hits += 1
+        else:
+            self.hits += 1
+        entry.hits += 1
+        self._entries.move_to_end(key)
+        return entry
+
+    def peek(self, key: Hashable) -> Optional[CacheEntry]:
+        """Return the entry for ``key`` as is, without touching LRU order, expiry or counters"""
+        return self._entries.get(key)
+
+    def is_servable(self, key: Hashable) -> bool:
+        """Whether ``get_entry(key, allow_stale=True)`` would return an entry, without touching
+        LRU order, expiry or counters (an expired entry stays until it is next read)"""
+        entry = self._entries.get(key)
+        return entry is not None and self.age(entry) <= self.ttl + self.stale_ttl
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self.get_entry(key)
+        return entry.value if entry is not None else default
+
+    def set(self, key: Hashable, value: Any, size: Optional[int] = None, stored_at: Optional[float] = None) -> bool:
+        """Insert or replace ``key``, evicting LRU entries until it fits.
+
+        Returns False (and stores nothing) if the value alone exceeds the budget.
+        """
+        if size is None:
+            size = self.sizeof(value)
+        hits = 0
+        if key in self._entries:
+            hits = self._remove(key).hits  # A refreshed value keeps the key's popularity
+        if size > self.max_bytes:
+            return False
+        while self._bytes + size > self.max_bytes:
+            self._evict_oldest()
+        entry = CacheEntry(value, self.clock() if stored_at is None else stored_at, size)
+        entry.hits = hits
+        self._entries[key] = entry
+        self._bytes += size
+        return True
+
+    def touch(self, key: Hashable, stored_at: Optional[float] = None) -> bool:
+        """Restart the TTL of an existing entry (e.g. after a successful revalidation)"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return False
+        entry.stored_at = self.clock() if stored_at is None else stored_at
+        return True
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        if key not in self._entries:
+            return default
+        return self._remove(key).value
+
+    def clear(self):
+        self._entries.clear()
+        self._bytes = 0
+        self.hits = self.misses = self.evictions = self.expirations = self.stale_hits = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+    def _remove(self, key: Hashable) -> CacheEntry:
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+        return entry
+
+    def _evict_oldest(self):
+        _, entry = self._entries.popitem(last=False)
+        self._bytes -= entry.size
+        self.evictions += 1
+
+
+def thread_connection(local: threading.local, path: str) -> sqlite3.Connection:
+    """The calling thread's connection to the SQLite file at ``path``, kept on ``local``.
+
+    Shared by every SQLite-backed store, so they all open the file the same way.
+    """
+    conn = getattr(local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(path, timeout=5)
+        conn.execute("PRAGMA journal_mode=WAL")  # Readers don't block the writer
+        conn.execute("PRAGMA synchronous=NORMAL")
+        local.conn = conn
+    return conn
+
+
+class SQLiteStore:
+    """Second cache tier shared by every worker (and surviving restarts) via a SQLite file.
+
+    Values are opaque blobs; entries older than ``ttl`` seconds are ignored and
+    deleted on read. Each thread gets its own connection, so calls can be
+    pushed to a thread pool from async code.
+    """
+
+    def __init__(self, path: str, ttl: float, clock: Callable[[], float] = time.time):
+        self.path = path
+        self.ttl = ttl
+        self.clock = clock
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS pages (key TEXT PRIMARY KEY, value BLOB NOT NULL, stored_at REAL NOT NULL)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        return thread_connection(self._local, self.path)
+
+    def get(self, key: str) -> Optional[Tuple[bytes, float]]:
+        """Return ``(value, stored_at)`` for a fresh entry, or None"""
+        conn = self._connect()
+        row = conn.execute("SELECT value, stored_at FROM pages WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        value, stored_at = row
+        if self.clock() - stored_at > self.ttl:
+            with conn:
+                conn.execute("DELETE FROM pages WHERE key = ? AND stored_at = ?", (key, stored_at))
+            return None
+        return value, stored_at
+
+    def set(self, key: str, value: bytes, stored_at: Optional[float] = None):
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO pages (key, value, stored_at) VALUES (?, ?, ?)",
+                (key, value, self.clock() if stored_at is None else stored_at),
+            )
+
+    def delete(self, key: str):
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM pages WHERE key = ?", (key,))
+
+    def purge_expired(self) -> int:
+        """Delete expired entries, returning how many were removed"""
+        conn = self._connect()
+        with conn:
+            cursor = conn.execute("DELETE FROM pages WHERE stored_at < ?", (self.clock() - self.ttl,))
+        return cursor.rowcount
+
+    def __len__(self) -> int:
+        return self._connect().execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+
+
+SNAPSHOT_MAGIC = b"GPCSNAP1"
+# stored_at, hits, key length, value length
+_SNAPSHOT_RECORD = struct.Struct("<dIHI")
+
+
+class SnapshotRecord(NamedTuple):
+    key: str
+    value: bytes
+    stored_at: float
+    hits: int
+
+
+@contextmanager
+def atomic_write(path: str, mode: str = "wb", encoding: Optional[str] = None) -> Iterator[IO]:
+    """Open a temp file that replaces ``path`` once the block completes; on error ``path`` is untouched.
+
+    Every call gets a temp file of its own next to ``path``, so workers
+    stopping together can each save the same file without clobbering one
+    another mid-write (the last to finish wins).
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=f"{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, mode, encoding=encoding) as f:
+            yield f
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def write_snapshot(path: str, records: Iterable[SnapshotRecord]) -> int:
+    """Write ``records`` to a snapshot file (replaced atomically), returning how many were written"""
+    count = 0
+    with atomic_write(path) as f:
+        f.write(SNAPSHOT_MAGIC)
+        for record in records:
+            key = record.key.encode("utf-8")
+            f.write(_SNAPSHOT_RECORD.pack(record.stored_at, record.hits, len(key), len(record.value)))
+            f.write(key)
+            f.write(record.value)
+            count += 1
+    return count
+
+
+def read_snapshot(path: str) -> Iterator[SnapshotRecord]:
+    """Records of a snapshot file in the order written, read through a memory map.
+
+    Raises ValueError for a file that isn't a snapshot; a truncated tail
+    (e.g. from a crash mid-write of a non-atomic copy) ends the iteration.
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size < len(SNAPSHOT_MAGIC):
+            raise ValueError(f"{path} is not a cache snapshot")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            if data[:len(SNAPSHOT_MAGIC)] != SNAPSHOT_MAGIC:
+                raise ValueError(f"{path} is not a cache snapshot")
+            offset = len(SNAPSHOT_MAGIC)
+            end = len(data)
+            while offset + _SNAPSHOT_RECORD.size <= end:
+                stored_at, hits, key_len, value_len = _SNAPSHOT_RECORD.unpack_from(data, offset)
+                offset += _SNAPSHOT_RECORD.size
+                if offset + key_len + value_len > end:
+                    return
+                key = data[offset:offset + key_len].decode("utf-8")
+                offset += key_len
+                value = data[offset:offset + value_len]
+                offset += value_len
+                yield SnapshotRecord(key, value, stored_at, hits)
@@ -0,0 +1,93 @@
+"""
+Response compression: Accept-Encoding negotiation and gzip/brotli/zstd encoders.
+
+gzip is always available; brotli and zstd are used when the ``brotli`` and
+``zstandard`` packages are installed. Bodies below a size threshold aren't
+worth compressing and are sent as is.
+"""
+import gzip
+import threading
+from typing import Callable, Dict, Iterable, Optional
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+# Levels favour ratio over speed: cached pages are compressed once and served many times
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 6
+ZSTD_LEVEL = 9
+
+
+_zstd_local = threading.local()
+
+def _zstd_compress(body: bytes) -> bytes:
+    # A ZstdCompressor must not be shared between threads, and encoders run in worker threads
+    compressor = getattr(_zstd_local, "compressor", None)
+    if compressor is None:
+        compressor = _zstd_local.compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL)
+    return compressor.compress(body)
+
+
+def _encoders() -> Dict[str, Callable[[bytes], bytes]]:
+    """Available encoders in server preference order (best ratio first)"""
+    encoders: Dict[str, Callable[[bytes], bytes]] = {}
+    if BROTLI_AVAILABLE:
+        encoders["br"] = lambda body: brotli.compress(body, quality=BROTLI_QUALITY)
+    if ZSTD_AVAILABLE:
+        encoders["zstd"] = _zstd_compress
+    encoders["gzip"] = lambda body: gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+    return encoders
+
+
+ENCODERS = _encoders()
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    return ENCODERS[encoding](body)
+
+
+def parse_accept_encoding(header: str) -> Dict[str, float]:
+    """Coding -> q-value from an Accept-Encoding header"""
+    accepted: Dict[str, float] = {}
+    for part in header.split(","):
+        coding, *params = part.strip().split(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.strip().partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[coding] = q
+    return accepted
+
+
+def negotiate(accept_encoding: Optional[str], offered: Iterable[str]) -> Optional[str]:
+    """Pick one of ``offered`` (in preference order) for the client, or None for identity.
+
+    The highest q-value wins; ties go to the earlier offered coding. ``*``
+    covers codings not listed explicitly and ``q=0`` rules a coding out.
+    """
+    if not accept_encoding:
+        return None
+    accepted = parse_accept_encoding(accept_encoding)
+    wildcard = accepted.get("*", 0.0)
+    best, best_q = None, 0.0
+    for coding in offered:
+        q = accepted.get(coding, wildcard)
+        if q > best_q:
+            best, best_q = coding, q
+    return best
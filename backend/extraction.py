@@ -0,0 +1,320 @@
+"""
+HTML extraction engines for Grokipedia pages.
+
+Both engines turn page HTML into the same ParsedPage: the title and content
+text (with citation markers, see CITATION_OPEN) and the reference URLs.
+``bs4`` is the reference implementation; ``lxml`` walks a libxml2 tree and is
+several times faster on large pages while producing identical output.
+"""
+import asyncio
+import multiprocessing
+import re
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+from urllib.parse import urljoin  # For absolute URLs
+
+from bs4 import BeautifulSoup
+
+try:
+    import lxml.html
+    from lxml import etree
+    LXML_AVAILABLE = True
+except ImportError:
+    LXML_AVAILABLE = False
+
+BASE_URL = "https://grokipedia.com"
+
+# <sup> contents are wrapped in these private-use characters in extracted text
+CITATION_OPEN = "\ue000"
+CITATION_CLOSE = "\ue001"
+
+UNWANTED_TAGS = ["script", "style", "nav", "header", "footer", "aside"]
+CONTENT_SELECTORS = ["article.prose", "div.content", "main", "article"]
+TEXT_SEPARATOR = "\n\n"
+
+_REFERENCES_CLASS_RE = re.compile(r'references?|citations?', re.I)
+
+
+class ParsedPage(NamedTuple):
+    title: str
+    content_text: str
+    reference_urls: List[str]
+
+
+def reference_url(hrefs) -> str:
+    """First http(s) or protocol-relative href, made absolute"""
+    for href in hrefs:
+        if href and (href.startswith(('http', '//'))):
+            return urljoin(BASE_URL, href)
+    return ""
+
+
+# --- BeautifulSoup engine -------------------------------------------------
+
+def find_content_div(soup: BeautifulSoup) -> BeautifulSoup:
+    for sel in CONTENT_SELECTORS:
+        div = soup.select_one(sel)
+        if div:
+            return div
+    return soup.body or soup  # Empty documents have no <body>
+
+def extract_reference_urls(soup: BeautifulSoup) -> List[str]:
+    # First, try to find <div id="references">
+    refs_div = soup.find('div', id='references')
+    if refs_div:
+        # Look for ol/ul inside refs_div
+        ol = refs_div.find('ol') or refs_div.find('ul')
+        if ol:
+            list_items = ol.find_all('li', recursive=True)
+        else:
+            # Fallback: direct li children of div
+            list_items = refs_div.find_all('li', recursive=True)
+    else:
+        # Fallback: search entire soup for ol with references/citations class
+        ol = soup.find('ol', class_=_REFERENCES_CLASS_RE)
+        if ol:
+            list_items = ol.find_all('li', recursive=True)
+        else:
+            return []
+
+    return [reference_url(a.get('href') for a in li.find_all('a', href=True)) for li in list_items]
+
+def parse_bs4(html: str, slug: str) -> ParsedPage:
+    soup = BeautifulSoup(html, "html.parser")
+
+    # Clean up: remove unwanted tags, but preserve references div
+    for tag in soup(UNWANTED_TAGS):
+        tag.decompose()
+
+    # Mark (outermost) citations instead of removing them
+    for sup in soup.find_all("sup"):
+        if sup.find_parent("sup") is None:
+            sup.insert(0, CITATION_OPEN)
+            sup.append(CITATION_CLOSE)
+
+    content_div = find_content_div(soup)
+
+    h1 = content_div.find("h1")
+    title = h1.get_text(strip=True) if h1 else slug.replace("_", " ")
+
+    # Extract ALL content text - frontend will truncate for display
+    content_text = content_div.get_text(separator=TEXT_SEPARATOR, strip=True)
+
+    return ParsedPage(title, content_text, extract_reference_urls(soup))
+
+
+# --- lxml engine ----------------------------------------------------------
+#
+# Mirrors parse_bs4 on a libxml2 tree. Differences between the two parsers'
+# trees are smoothed over where they affect output: html.parser only has a
+# <body> when the markup contains one, and text is joined the way
+# BeautifulSoup.get_text(separator, strip=True) joins its strings.
+#
+# UNWANTED_TAGS are skipped rather than removed from the tree: removing an
+# element merges its tail into the text before it, where decompose() leaves
+# two separate strings.
+
+_BODY_TAG_RE = re.compile(r'<body[\s>/]', re.I)
+# html.parser gives text inside these tags special string types that get_text() skips
+_STRING_CONTAINER_TAGS = {"rt", "rp", "template"}
+
+_UNWANTED = frozenset(UNWANTED_TAGS)
+
+def _has_class(class_name: str) -> str:
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {class_name} ')"
+
+_KEPT = f"not(ancestor::*[{' or '.join(f'self::{tag}' for tag in UNWANTED_TAGS)}])"
+
+_CONTENT_XPATHS = [
+    f"//article[{_has_class('prose')}][{_KEPT}]",
+    f"//div[{_has_class('content')}][{_KEPT}]",
+    f"//main[{_KEPT}]",
+    f"//article[{_KEPT}]",
+]
+
+def _is_removed(el) -> bool:
+    """Whether parse_bs4 would have removed ``el`` along with an unwanted ancestor"""
+    return any(ancestor.tag in _UNWANTED for ancestor in el.iterancestors())
+
+def _kept_descendants(el, *tags):
+    """Descendants of ``el`` (itself kept) with one of ``tags`` that aren't inside an unwanted tag"""
+    if next(el.iterdescendants(*UNWANTED_TAGS), None) is None:
+        return el.iterdescendants(*tags)
+    return (d for d in el.iterdescendants(*tags) if not _is_removed(d))
+
+def _text_segments(root) -> List[str]:
+    """Stripped, non-empty text nodes under ``root`` (document order) with citation markers"""
+    segments = []
+    in_container = any(a.tag in _STRING_CONTAINER_TAGS for a in root.iterancestors())
+    # Explicit stack of (element, skip_text, in_sup) or plain strings, popped in document order
+    stack = [(root, in_container, False)]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, str):
+            text = item.strip()
+            if text:
+                segments.append(text)
+            continue
+        el, skip, in_sup = item
+        # Comments and processing instructions have a non-string tag; only their tail is text
+        if not isinstance(el.tag, str):
+            continue
+        skip = skip or el.tag in _STRING_CONTAINER_TAGS
+        opens_citation = el.tag == "sup" and not in_sup
+        if opens_citation:
+            segments.append(CITATION_OPEN)
+            stack.append(CITATION_CLOSE)
+        for child in reversed(el):
+            # A child's tail is text of this element that follows the child
+            if child.tail and not skip:
+                stack.append(child.tail)
+            if child.tag not in _UNWANTED:
+                stack.append((child, skip, in_sup or opens_citation))
+        if el.text and not skip:
+            stack.append(el.text)
+    return segments
+
+def _is_in_sup(el) -> bool:
+    return any(ancestor.tag == "sup" for ancestor in el.iterancestors())
+
+def _lxml_reference_urls(doc) -> List[str]:
+    refs_div = next(iter(doc.xpath(f"//div[@id='references'][{_KEPT}]")), None)
+    if refs_div is not None:
+        ol = next(_kept_descendants(refs_div, "ol"), None)
+        if ol is None:
+            ol = next(_kept_descendants(refs_div, "ul"), None)
+        list_items = _kept_descendants(ol if ol is not None else refs_div, "li")
+    else:
+        ol = next((el for el in doc.iter("ol")
+                   if _REFERENCES_CLASS_RE.search(el.get("class") or "") and not _is_removed(el)), None)
+        if ol is None:
+            return []
+        list_items = _kept_descendants(ol, "li")
+
+    return [
+        reference_url(a.get("href") for a in _kept_descendants(li, "a") if a.get("href") is not None)
+        for li in list_items
+    ]
+
+def parse_lxml(html: str, slug: str) -> ParsedPage:
+    try:
+        doc = lxml.html.document_fromstring(html.encode("utf-8"), parser=_LXML_PARSER)
+    except etree.ParserError:  # Nothing but whitespace/comments
+        return ParsedPage(slug.replace("_", " "), "", [])
+
+    content_div = None
+    for xpath in _CONTENT_XPATHS:
+        matches = doc.xpath(xpath)
+        if matches:
+            content_div = matches[0]
+            break
+    if content_div is None:
+        body = doc.find("body")
+        content_div = body if body is not None and _BODY_TAG_RE.search(html) else doc
+
+    h1 = next(_kept_descendants(content_div, "h1"), None)
+    if h1 is not None:
+        title = "".join(_text_segments(h1))
+        # Citations are only marked at the outermost <sup>
+        if _is_in_sup(h1):
+            title = title.replace(CITATION_OPEN, "").replace(CITATION_CLOSE, "")
+    else:
+        title = slug.replace("_", " ")
+
+    segments = _text_segments(content_div)
+    if _is_in_sup(content_div):
+        segments = [s for s in segments if s not in (CITATION_OPEN, CITATION_CLOSE)]
+
+    return ParsedPage(title, TEXT_SEPARATOR.join(segments), _lxml_reference_urls(doc))
+
+if LXML_AVAILABLE:
+    _LXML_PARSER = lxml.html.HTMLParser(encoding="utf-8")
+
+
+ENGINES: Dict[str, Callable[[str, str], ParsedPage]] = {"bs4": parse_bs4}
+if LXML_AVAILABLE:
+    ENGINES["lxml"] = parse_lxml
+
+def parse_html(html: str, slug: str, engine: str = "bs4") -> ParsedPage:
+    return ENGINES[engine](html, slug)
+
+def parse_html_bytes(content: bytes, encoding: str, slug: str, engine: str = "bs4") -> ParsedPage:
+    """Decode raw response bytes and parse them (the unit of work sent to ParsePool workers)"""
+    return parse_html(content.decode(encoding, errors="replace"), slug, engine)
+
+
+class ParsePool:
+    """Runs HTML parsing off the event loop thread.
+
+    ``mode`` is "process" (true multi-core parallelism; only the raw bytes and
+    the ParsedPage cross the process boundary), "thread" or "inline". Queue
+    depth and timing counters are kept for sizing the pool.
+    """
+
+    MODES = ("process", "thread", "inline")
+
+    def __init__(self, mode: str = "process", workers: int = 2):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown parse pool mode {mode!r} (choose from {self.MODES})")
+        self.mode = mode
+        self.workers = workers
+        self._executor: Optional[Executor] = None
+        self.pending = 0  # Submitted and not yet finished (queued + running)
+        self.max_pending = 0
+        self.completed = 0
+        self.failed = 0
+        self.total_seconds = 0.0
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.mode == "process":
+                # spawn: forking a process that runs threads (event loop helpers, sqlite) is unsafe
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="parse")
+        return self._executor
+
+    async def parse(self, content: bytes, encoding: str, slug: str, engine: str = "bs4") -> ParsedPage:
+        start = time.perf_counter()
+        self.pending += 1
+        self.max_pending = max(self.max_pending, self.pending)
+        try:
+            if self.mode == "inline":
+                return parse_html_bytes(content, encoding, slug, engine)
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self._get_executor(), parse_html_bytes, content, encoding, slug, engine
+            )
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM on a huge page); start a fresh pool next time
+            self._executor = None
+            self.failed += 1
+            raise
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.pending -= 1
+            self.completed += 1
+            self.total_seconds += time.perf_counter() - start
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "workers": self.workers,
+            "pending": self.pending,
+            "queued": max(0, self.pending - self.workers) if self.mode != "inline" else 0,
+            "max_pending": self.max_pending,
+            "completed": self.completed,
+            "failed": self.failed,
+            "avg_ms": round(self.total_seconds / self.completed * 1000, 2) if self.completed else 0.0,
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,111 @@
+"""
+Logging setup: request handlers only put records on a queue and a background
+thread writes them to stdout, so a slow or contended stdout never blocks the
+event loop. Output is either the classic text format or JSON lines, and a
+sampled structured log line can be written per request.
+"""
+import atexit
+import json
+import logging
+import queue
+import random
+import sys
+import time
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Optional
+
+from timing import current_timings
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Attributes every LogRecord has; anything else was passed via ``extra``
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; ``extra`` fields are included as top-level keys"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def configure_logging(level: str = "INFO", fmt: str = "text") -> QueueListener:
+    """Route all logging through a queue to a stdout writer thread (stopped at exit)"""
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(JsonFormatter() if fmt == "json" else logging.Formatter(TEXT_FORMAT))
+
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        if isinstance(existing, QueueHandler):
+            root.removeHandler(existing)
+    root.addHandler(QueueHandler(log_queue))
+    root.setLevel(level.upper())
+
+    listener = QueueListener(log_queue, handler)
+    listener.start()
+    atexit.register(_stop_listener, listener)
+    return listener
+
+
+def _stop_listener(listener: QueueListener):
+    """Drain the queue and stop the writer thread, if it's still running"""
+    if listener._thread is not None:
+        listener.stop()
+
+
+class RequestLogMiddleware:
+    """ASGI middleware writing one structured record for a sample of requests.
+
+    ``sample_rate`` of the requests are logged at INFO with method, path,
+    status, duration and the Server-Timing stages as fields (use the JSON log
+    format to get them as keys); server errors are always logged.
+    """
+
+    def __init__(self, app, sample_rate: float, logger: Optional[logging.Logger] = None):
+        self.app = app
+        self.sample_rate = sample_rate
+        self.logger = logger or logging.getLogger("grokipedia.requests")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = 500
+        start = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            if status >= 500 or (self.sample_rate and random.random() < self.sample_rate):
+                self._log(scope, status, time.perf_counter() - start)
+
+    def _log(self, scope, status: int, seconds: float):
+        timings = current_timings() or {}
+        self.logger.info(
+            "%s %s %s %.1fms", scope["method"], scope["path"], status, seconds * 1000,
+            extra={
+                "method": scope["method"],
+                "path": scope["path"],
+                "status": status,
+                "duration_ms": round(seconds * 1000, 2),
+                "stages_ms": {name: round(value * 1000, 2) for name, value in timings.items()},
+            },
+        )
@@ -1,16 +1,37 @@
 # Unofficial API for xAI's Grokipedia (not affiliated)
 from api_analytics.fastapi import Analytics
 from fastapi import FastAPI, HTTPException, Query, Request, Depends
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, Response, StreamingResponse
+from starlette.background import BackgroundTask
 from fastapi.staticfiles import StaticFiles
-from pydantic import BaseModel
-from typing import Optional, List
+from pydantic import BaseModel, Field
+from cache import CacheEntry, LRUCache, SnapshotRecord, SQLiteStore, read_snapshot, write_snapshot
+from rate_limit import SlidingWindowLimiter, SQLiteCounterStore
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, MetricsMiddleware, Registry
+from timing import ServerTimingMiddleware, server_timing, stop_recording
+from log_config import RequestLogMiddleware, configure_logging
+from content_encoding import ENCODERS, compress, negotiate
+import warmup
+from extraction import (
+    CITATION_OPEN, CITATION_CLOSE, ENGINES, ParsedPage, ParsePool,
+    find_content_div, extract_reference_urls, parse_html
+)
+from typing import Dict, Iterable, NamedTuple, Optional, List, Tuple
 from bs4 import BeautifulSoup
-import requests
+from contextlib import asynccontextmanager
+import httpx
+import asyncio
+import functools
+import hashlib
+import itertools
+import json
 import re
+import sqlite3
+import zlib
 import urllib.parse
-from datetime import datetime, timedelta
-from urllib.parse import urljoin  # For absolute URLs
+import weakref
+from array import array
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
 import sys
 from collections import defaultdict
@@ -22,27 +43,81 @@ import logging
 # Load environment variables from .env file
 load_dotenv()
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(sys.stdout)
-    ]
-)
+# Configure logging: queued to a writer thread; LOG_FORMAT=json for JSON lines
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+# Share of requests written as a structured request log record (server errors always are)
+REQUEST_LOG_SAMPLE_RATE = float(os.getenv("REQUEST_LOG_SAMPLE_RATE", "0.01"))
+log_listener = configure_logging(LOG_LEVEL, LOG_FORMAT)
 logger = logging.getLogger(__name__)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if _shared_store is not None:
+        purged = await asyncio.to_thread(_shared_store.purge_expired)
+        logger.info(f"Shared page cache at {PAGE_CACHE_DB} ({purged} expired entries purged)")
+    if CACHE_SNAPSHOT_PATH:
+        await load_cache_snapshot()
+    warmup_task = None
+    if WARMUP_SOURCES:
+        warmup_task = asyncio.ensure_future(warm_up(WARMUP_SOURCES, WARMUP_LIMIT, WARMUP_CONCURRENCY))
+        if WARMUP_BLOCKING:
+            await warmup_task
+    yield
+    if warmup_task is not None:
+        warmup_task.cancel()
+    if HIT_COUNTS_FILE:
+        await save_hit_counts()
+    if CACHE_SNAPSHOT_PATH:
+        await save_cache_snapshot()
+    await close_http_client()
+    parse_pool.shutdown()
+    await asyncio.to_thread(rate_limiter.flush)
+
 app = FastAPI(
     title="Grokipedia API v0.3",
     description="Unofficial API for xAI's Grokipedia (not affiliated)",
     version="0.3.0-beta",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan
 )
 
 # Add FastAPI Analytics middleware with API key
 app.add_middleware(Analytics, api_key=os.getenv("ANALYTICS_KEY") )
 
+# Prometheus metrics (served on /metrics); per worker process
+metrics = Registry()
+HTTP_REQUEST_DURATION = metrics.histogram(
+    "grokipedia_http_request_duration_seconds", "Request latency by route template", ["method", "route", "status"]
+)
+HTTP_REQUESTS_IN_PROGRESS = metrics.gauge("grokipedia_http_requests_in_progress", "Requests being handled")
+UPSTREAM_FETCH_DURATION = metrics.histogram(
+    "grokipedia_upstream_fetch_duration_seconds", "Grokipedia fetch latency", ["status"]
+)
+PARSE_DURATION = metrics.histogram(
+    "grokipedia_parse_duration_seconds", "HTML parse time including parse pool queueing", ["engine"]
+)
+RENDER_DURATION = metrics.histogram(
+    "grokipedia_render_duration_seconds", "Time to build a Page view from a cached article"
+)
+RATE_LIMIT_REJECTIONS = metrics.counter(
+    "grokipedia_rate_limit_rejections_total", "Requests rejected by rate or concurrency limits", ["reason"]
+)
+metrics.gauge("grokipedia_upstream_fetches_in_flight", "Distinct slugs being fetched", fn=lambda: len(_inflight))
+metrics.gauge("grokipedia_parse_pool_pending", "Parses queued or running", fn=lambda: parse_pool.pending)
+metrics.gauge("grokipedia_cache_entries", "Cached articles", fn=lambda: len(_cache))
+metrics.gauge("grokipedia_cache_bytes", "Accounted size of cached articles", fn=lambda: _cache.total_bytes)
+for _counter in ("hits", "stale_hits", "misses", "evictions", "expirations"):
+    metrics.counter(
+        f"grokipedia_cache_{_counter}_total", f"Article cache {_counter.replace('_', ' ')}",
+        fn=lambda name=_counter: getattr(_cache, name),
+    )
+app.add_middleware(MetricsMiddleware, duration=HTTP_REQUEST_DURATION, in_progress=HTTP_REQUESTS_IN_PROGRESS)
+app.add_middleware(RequestLogMiddleware, sample_rate=REQUEST_LOG_SAMPLE_RATE)
+# Server-Timing stage breakdown on every response; requests sending X-Profile-Key: $PROFILE_SECRET get a cProfile report
+app.add_middleware(ServerTimingMiddleware, profile_secret=lambda: os.getenv("PROFILE_SECRET"))
+
 # Robust INDEX_PATH: Start from cwd, fallback to __file__ if needed
 base_path = Path.cwd()
 INDEX_PATH = base_path / "public" / "static" / "index.html"
@@ -57,50 +132,273 @@ if static_dir.exists() and os.getenv("VERCEL") is None:
     from fastapi.staticfiles import StaticFiles
     app.mount("/static", StaticFiles(directory="public/static", html=True), name="static")
 
-BASE_URL = "https://grokipedia.com"
-_cache = {}
-MAX_CACHE_SIZE = 1000  # Adjust as needed; keeps cache small (~50MB assuming avg 50KB/page)
+BASE_URL = os.getenv("UPSTREAM_BASE_URL", "https://grokipedia.com")  # Overridable for mirrors and load tests
 CACHE_TTL = timedelta(days=2)
+MAX_CACHE_BYTES = int(os.getenv("CACHE_MAX_BYTES", str(50 * 1024 * 1024)))  # Byte budget; pages range 2KB-500KB
+# Stale-while-revalidate: expired pages are still served for this long while a background refresh runs
+CACHE_STALE_TTL = timedelta(seconds=int(os.getenv("CACHE_STALE_SECONDS", str(24 * 60 * 60))))
+# Refresh-ahead: pages requested within this window before expiry are re-fetched in the background
+CACHE_REFRESH_AHEAD = timedelta(seconds=int(os.getenv("CACHE_REFRESH_AHEAD_SECONDS", str(6 * 60 * 60))))
+# After a failed background refresh, wait this long before refreshing the page again
+CACHE_REFRESH_RETRY = timedelta(seconds=int(os.getenv("CACHE_REFRESH_RETRY_SECONDS", "300")))
+# Keep cached article text zlib-compressed (~4x smaller; inflated when a view is first rendered)
+CACHE_COMPRESS_TEXT = os.getenv("CACHE_COMPRESS_TEXT", "false").lower() in ("1", "true", "yes")
+# Shorter article text is kept as is: zlib's header and a per-render inflate outweigh the bytes saved
+CACHE_COMPRESS_TEXT_MIN_BYTES = int(os.getenv("CACHE_COMPRESS_TEXT_MIN_BYTES", "1024"))
+_cache = LRUCache(
+    max_bytes=MAX_CACHE_BYTES,
+    ttl=CACHE_TTL.total_seconds(),
+    stale_ttl=CACHE_STALE_TTL.total_seconds(),
+    sizeof=lambda article: article.nbytes(),
+)
+# Encoded JSON of rendered page views, so a cache hit is returned without rendering or serializing
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+_response_cache = LRUCache(
+    max_bytes=RESPONSE_CACHE_MAX_BYTES,
+    ttl=(CACHE_TTL + CACHE_STALE_TTL).total_seconds(),  # Freshness is decided by _cache
+    sizeof=lambda rendered: len(rendered.body) + sum(map(len, rendered.encoded.values())),
+)
+# Compressed variants of cached pages are made once, when the view is first rendered
+RESPONSE_ENCODINGS = [
+    encoding for encoding in os.getenv("RESPONSE_ENCODINGS", ",".join(ENCODERS)).split(",") if encoding in ENCODERS
+]
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))  # Smaller bodies are sent uncompressed
+# Cache snapshot: written on graceful shutdown and loaded at startup, so a restart comes back warm
+CACHE_SNAPSHOT_PATH = os.getenv("CACHE_SNAPSHOT_PATH")
+# Warm-up: prefetch popular slugs at startup (see warmup.py for the sources)
+WARMUP_SOURCES = [source.strip() for source in os.getenv("WARMUP_SOURCES", "").split(",") if source.strip()]
+WARMUP_LIMIT = int(os.getenv("WARMUP_LIMIT", "500"))
+WARMUP_CONCURRENCY = int(os.getenv("WARMUP_CONCURRENCY", "4"))  # Kept low so real traffic isn't starved
+WARMUP_BLOCKING = os.getenv("WARMUP_BLOCKING", "false").lower() in ("1", "true", "yes")  # Finish before serving
+WARMUP_SLUGS_FILE = os.getenv("WARMUP_SLUGS_FILE")
+HIT_COUNTS_FILE = os.getenv("HIT_COUNTS_FILE")  # Per-slug hit counts saved on shutdown for the "hits" source
+# Optional: slug sync table (see sync_slugs.py) consulted for sitemap lastmod before refreshing a page
+SUPABASE_URL = os.getenv("NEXT_PUBLIC_SUPABASE_URL") or os.getenv("SUPABASE_URL")
+SUPABASE_KEY = os.getenv("NEXT_PUBLIC_SUPABASE_ANON_KEY") or os.getenv("SUPABASE_ANON_KEY")
+SITEMAP_LOOKUP_TIMEOUT = float(os.getenv("SITEMAP_LOOKUP_TIMEOUT", "2"))
+# Optional second tier shared by all workers and restarts (path to a SQLite file)
+PAGE_CACHE_DB = os.getenv("PAGE_CACHE_DB")
+_shared_store = SQLiteStore(PAGE_CACHE_DB, ttl=(CACHE_TTL + CACHE_STALE_TTL).total_seconds()) if PAGE_CACHE_DB else None
+# HTML extraction engine: "bs4" (reference) or "lxml" (faster, same output; needs lxml installed)
+HTML_PARSER = os.getenv("HTML_PARSER", "bs4")
+if HTML_PARSER not in ENGINES:
+    logger.warning(f"HTML_PARSER={HTML_PARSER} is not available (choose from {sorted(ENGINES)}) - using bs4")
+    HTML_PARSER = "bs4"
+# Where parsing runs: "process" pool (multi-core), "thread" pool, or "inline" on the event loop
+PARSE_POOL = os.getenv("PARSE_POOL", "process")
+PARSE_WORKERS = int(os.getenv("PARSE_WORKERS", str(min(4, os.cpu_count() or 1))))
+parse_pool = ParsePool(PARSE_POOL, PARSE_WORKERS)
+_inflight: dict[str, asyncio.Task] = {}  # slug -> in-flight fetch task (single-flight)
+
+# POST /pages limits: slugs per request, and concurrent upstream fetches per request
+BATCH_MAX_SLUGS = int(os.getenv("BATCH_MAX_SLUGS", "100"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+# POST /pages/stream holds only BATCH_CONCURRENCY results at a time, so it accepts far more slugs
+STREAM_MAX_SLUGS = int(os.getenv("STREAM_MAX_SLUGS", "10000"))
+
+# Upstream HTTP client: one pooled keep-alive client shared by all requests
+UPSTREAM_TIMEOUT = float(os.getenv("UPSTREAM_TIMEOUT", "10"))  # Seconds per read/write/pool wait
+UPSTREAM_CONNECT_TIMEOUT = float(os.getenv("UPSTREAM_CONNECT_TIMEOUT", "5"))
+UPSTREAM_MAX_CONNECTIONS = int(os.getenv("UPSTREAM_MAX_CONNECTIONS", "100"))
+UPSTREAM_MAX_KEEPALIVE = int(os.getenv("UPSTREAM_MAX_KEEPALIVE", "20"))
+UPSTREAM_HTTP2 = os.getenv("UPSTREAM_HTTP2", "true").lower() in ("1", "true", "yes")
+USER_AGENT = "Grokipedia-API/0.1"
+
+try:
+    import h2  # noqa: F401 - httpx only negotiates HTTP/2 when h2 is installed
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+_http_client: Optional[httpx.AsyncClient] = None
+
+def get_http_client() -> httpx.AsyncClient:
+    """Return the shared upstream client, creating it on first use"""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            http2=UPSTREAM_HTTP2 and HTTP2_AVAILABLE,
+            timeout=httpx.Timeout(UPSTREAM_TIMEOUT, connect=UPSTREAM_CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=UPSTREAM_MAX_CONNECTIONS,
+                max_keepalive_connections=UPSTREAM_MAX_KEEPALIVE,
+            ),
+            headers={"User-Agent": USER_AGENT},
+            follow_redirects=True,
+        )
+        logger.info(
+            f"Created upstream HTTP client (http2={UPSTREAM_HTTP2 and HTTP2_AVAILABLE}, "
+            f"max_connections={UPSTREAM_MAX_CONNECTIONS}, timeout={UPSTREAM_TIMEOUT}s)"
+        )
+    return _http_client
+
+async def close_http_client():
+    """Close pooled upstream connections (called on app shutdown)"""
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+async def fetch_upstream(url: str, headers: Optional[dict] = None) -> httpx.Response:
+    """GET a Grokipedia URL through the shared client without blocking the event loop"""
+    start = time.perf_counter()
+    status = "error"
+    try:
+        resp = await get_http_client().get(url, headers=headers)
+        status = str(resp.status_code)
+        return resp
+    finally:
+        UPSTREAM_FETCH_DURATION.observe(time.perf_counter() - start, status=status)
 
 # Rate limiting setup
-request_times = defaultdict(list)
 RATE_LIMIT = 100  # Generous: 100 requests per window
 RATE_WINDOW = 60  # 60 seconds (1 minute)
+# Hard cap on tracked IPs; idle ones are dropped after two windows anyway
+RATE_LIMIT_MAX_CLIENTS = int(os.getenv("RATE_LIMIT_MAX_CLIENTS", "100000"))
+# Optional: share counts between workers/replicas through a SQLite file, flushed in batches
+RATE_LIMIT_DB = os.getenv("RATE_LIMIT_DB")
+RATE_LIMIT_FLUSH_SECONDS = float(os.getenv("RATE_LIMIT_FLUSH_SECONDS", "0.5"))
+rate_limiter = SlidingWindowLimiter(
+    RATE_LIMIT, RATE_WINDOW, max_clients=RATE_LIMIT_MAX_CLIENTS,
+    store=SQLiteCounterStore(RATE_LIMIT_DB) if RATE_LIMIT_DB else None,
+    flush_interval=RATE_LIMIT_FLUSH_SECONDS,
+)
 
-def rate_limit_dependency(request: Request):
-    client_ip = request.client.host
-    now = time.time()
-    # Clean expired timestamps
-    request_times[client_ip] = [t for t in request_times[client_ip] if now - t < RATE_WINDOW]
+# Proxies whose X-Forwarded-For header is trusted to carry the real client IP
+TRUSTED_PROXIES = {ip.strip() for ip in os.getenv("TRUSTED_PROXIES", "").split(",") if ip.strip()}
 
-    current_count = len(request_times[client_ip])
-    if current_count >= RATE_LIMIT:
-        logger.warning(f"Rate limit exceeded for IP {client_ip}: {current_count}/{RATE_LIMIT} requests in {RATE_WINDOW}s")
-        raise HTTPException(
-            status_code=429,
-            detail=f"Rate limit exceeded ({RATE_LIMIT} requests per {RATE_LIMIT} seconds). Try again later."
-        )
-    request_times[client_ip].append(now)
-    logger.debug(f"Rate limit check passed for IP {client_ip}: {current_count + 1}/{RATE_LIMIT} requests")
+class ApiKey(NamedTuple):
+    name: str
+    rate_limit: int = RATE_LIMIT  # Requests per RATE_WINDOW
+    max_concurrency: int = 0  # Simultaneous requests per worker (0 = unlimited)
+    per_ip: bool = False  # Limit each client IP separately instead of the key as a whole
+
+def load_api_keys() -> dict[str, ApiKey]:
+    """Keys from API_KEYS_FILE or API_KEYS, mapped from the secret to their limits.
+
+    Both hold a JSON list of ``{"name", "key", "rate_limit", "max_concurrency", "per_ip"}``
+    objects; only name and key are required.
+    """
+    path = os.getenv("API_KEYS_FILE")
+    raw = Path(path).read_text() if path else os.getenv("API_KEYS")
+    if not raw:
+        return {}
+    keys = {}
+    for item in json.loads(raw):
+        secret = item.pop("key")
+        keys[secret] = ApiKey(**item)
+    return keys
+
+API_KEYS = load_api_keys()
+# API_SECRET_KEY is shared by every frontend user, so it is limited per client IP
+DEFAULT_API_KEY = ApiKey(name="default", per_ip=True)
+_active_requests: dict[str, int] = defaultdict(int)  # Key name -> requests in progress
+
+def client_ip(request: Request) -> str:
+    """Client IP, taken from X-Forwarded-For when the request came through a trusted proxy"""
+    ip = request.client.host
+    if ip in TRUSTED_PROXIES:
+        # Rightmost address not added by one of our own proxies
+        for hop in reversed(request.headers.get("X-Forwarded-For", "").split(",")):
+            hop = hop.strip()
+            if hop:
+                ip = hop
+                if hop not in TRUSTED_PROXIES:
+                    break
+    return ip
 
 # API Key authentication
-def verify_api_key(request: Request):
+def verify_api_key(request: Request) -> ApiKey:
     api_key = request.headers.get("X-API-Key")
     expected_key = os.getenv("API_SECRET_KEY")
+    ip = client_ip(request)
 
-    if not expected_key:
+    if not expected_key and not API_KEYS:
         logger.error("API_SECRET_KEY not configured in environment")
         raise HTTPException(status_code=500, detail="API authentication not configured")
 
     if not api_key:
-        logger.warning(f"Missing API key from IP {request.client.host}")
+        logger.warning(f"Missing API key from IP {ip}")
+        reject_unauthenticated(ip)
         raise HTTPException(status_code=401, detail="Missing X-API-Key header")
 
-    if api_key != expected_key:
-        logger.warning(f"Invalid API key attempt from IP {request.client.host}")
+    if api_key in API_KEYS:
+        key = API_KEYS[api_key]
+    elif expected_key and api_key == expected_key:
+        key = DEFAULT_API_KEY
+    else:
+        logger.warning(f"Invalid API key attempt from IP {ip}")
+        reject_unauthenticated(ip)
         raise HTTPException(status_code=403, detail="Invalid API key")
 
-    logger.debug(f"API key verified for IP {request.client.host}")
+    logger.debug("API key %s verified for IP %s", key.name, ip)
+    return key
+
+def reject_unauthenticated(ip: str):
+    """Failed auth attempts count against the IP's default limit, so keys can't be brute-forced"""
+    if not rate_limiter.hit(f"ip:{ip}"):
+        RATE_LIMIT_REJECTIONS.inc(reason="auth")
+        raise HTTPException(status_code=429, detail="Rate limit exceeded. Try again later.")
+
+def charge_rate_limit(request: Request, api_key: ApiKey, cost: int = 1):
+    """Count ``cost`` requests against the key's rate limit, or reject the whole request with 429"""
+    limit_key = f"ip:{client_ip(request)}" if api_key.per_ip else f"key:{api_key.name}"
+    if cost > api_key.rate_limit:
+        RATE_LIMIT_REJECTIONS.inc(reason="rate")
+        raise HTTPException(
+            status_code=429,
+            detail=f"Batch of {cost} pages exceeds the rate limit ({api_key.rate_limit} requests per {RATE_WINDOW} seconds)",
+        )
+    if not rate_limiter.hit(limit_key, api_key.rate_limit, cost):
+        RATE_LIMIT_REJECTIONS.inc(reason="rate")
+        logger.warning(f"Rate limit exceeded for {limit_key}: {api_key.rate_limit} requests in {RATE_WINDOW}s")
+        raise HTTPException(
+            status_code=429,
+            detail=f"Rate limit exceeded ({api_key.rate_limit} requests per {RATE_WINDOW} seconds). Try again later.",
+            headers={"Retry-After": str(rate_limiter.retry_after(limit_key, api_key.rate_limit, cost))},
+        )
+
+def rate_limit_dependency(request: Request, api_key: ApiKey = Depends(verify_api_key)):
+    charge_rate_limit(request, api_key)
+
+def acquire_concurrency_slot(api_key: ApiKey):
+    """Take one of the key's max_concurrency slots (counted per worker process), or reject with 429.
+
+    Returns the function that gives the slot back; calling it more than once is harmless.
+    """
+    if not api_key.max_concurrency:
+        return lambda: None
+    if _active_requests[api_key.name] >= api_key.max_concurrency:
+        RATE_LIMIT_REJECTIONS.inc(reason="concurrency")
+        logger.warning(f"Concurrency limit reached for key {api_key.name}: {api_key.max_concurrency}")
+        raise HTTPException(
+            status_code=429,
+            detail=f"Too many concurrent requests (max {api_key.max_concurrency} for this API key)",
+        )
+    _active_requests[api_key.name] += 1
+    released = False
+
+    def release():
+        nonlocal released
+        if not released:
+            released = True
+            _active_requests[api_key.name] -= 1
+    return release
+
+async def concurrency_limit(api_key: ApiKey = Depends(verify_api_key)):
+    """Hold a concurrency slot for the duration of the request"""
+    release = acquire_concurrency_slot(api_key)
+    try:
+        yield
+    finally:
+        release()
+
+# Every API endpoint: authenticate, then apply the key's rate and concurrency limits
+API_DEPENDENCIES = [Depends(verify_api_key), Depends(rate_limit_dependency), Depends(concurrency_limit)]
+# Batch endpoints charge one request per page, so they apply both limits themselves
+# once the body is parsed (streaming also has to hold its slot until the body is sent:
+# yield dependencies are torn down before that)
+BATCH_DEPENDENCIES = [Depends(verify_api_key)]
 
 class Reference(BaseModel):
     number: int
@@ -116,6 +414,113 @@ class Page(BaseModel):
     references_count: int
     references: Optional[List[Reference]] = None
 
+class Article:
+    """Canonical parse of a Grokipedia page, cached once per slug.
+
+    ``title`` and ``content_text`` keep citation (<sup>) markers so every
+    extract_refs/truncate/citations combination can be rendered from it.
+
+    Stored compactly, since thousands are cached: ``content_text`` is kept
+    as UTF-8 (citation markers would make a str 2 bytes per character),
+    zlib-compressed with CACHE_COMPRESS_TEXT, and the reference URLs are one
+    joined string plus an array of end offsets (numbers are 1..n). Reference
+    models are only built when a view is rendered.
+    """
+    __slots__ = ("title", "slug", "url", "_text", "_compressed", "_ref_urls", "_ref_ends",
+                 "etag", "last_modified", "__weakref__")
+
+    def __init__(self, title: str, slug: str, url: str, content_text: str, reference_urls: Iterable[str] = (),
+                 etag: Optional[str] = None, last_modified: Optional[str] = None):
+        self.title = title
+        self.slug = slug
+        self.url = url
+        text = content_text.encode("utf-8")
+        self._compressed = CACHE_COMPRESS_TEXT and len(text) >= CACHE_COMPRESS_TEXT_MIN_BYTES
+        self._text = zlib.compress(text) if self._compressed else text
+        reference_urls = tuple(reference_urls)  # Read twice below; may be a one-shot iterator
+        ends = array("I")
+        length = 0
+        for ref_url in reference_urls:
+            length += len(ref_url)
+            ends.append(length)
+        self._ref_urls = "".join(reference_urls) if ends else ""
+        self._ref_ends = ends
+        # Upstream validators for conditional refreshes
+        self.etag = etag
+        self.last_modified = last_modified
+
+    @property
+    def content_text(self) -> str:
+        text = zlib.decompress(self._text) if self._compressed else self._text
+        return text.decode("utf-8")
+
+    @property
+    def reference_urls(self) -> List[str]:
+        urls, start = [], 0
+        for end in self._ref_ends:
+            urls.append(self._ref_urls[start:end])
+            start = end
+        return urls
+
+    @property
+    def references(self) -> List[Reference]:
+        return [Reference(number=i, url=ref_url) for i, ref_url in enumerate(self.reference_urls, 1)]
+
+    @property
+    def references_count(self) -> int:
+        return len(self._ref_ends)
+
+    def nbytes(self) -> int:
+        """Memory held by this article, for the cache's byte budget"""
+        fields = (self.title, self.slug, self.url, self._text, self._ref_urls, self._ref_ends,
+                  self.etag, self.last_modified)
+        return sys.getsizeof(self) + sum(sys.getsizeof(value) for value in fields if value is not None)
+
+    def to_dict(self) -> dict:
+        return {
+            "title": self.title, "slug": self.slug, "url": self.url, "content_text": self.content_text,
+            "reference_urls": self.reference_urls, "etag": self.etag, "last_modified": self.last_modified,
+        }
+
+class PageBatchRequest(BaseModel):
+    slugs: List[str] = Field(..., min_length=1, max_length=BATCH_MAX_SLUGS)
+    extract_refs: bool = True
+    truncate: Optional[int] = None
+    citations: bool = False
+
+class PageStreamRequest(PageBatchRequest):
+    slugs: List[str] = Field(..., min_length=1, max_length=STREAM_MAX_SLUGS)
+
+class PageResult(BaseModel):
+    slug: str  # As requested
+    status: int
+    page: Optional[Page] = None
+    error: Optional[str] = None
+
+class PageBatch(BaseModel):
+    results: List[PageResult]
+
+class RenderedPage(NamedTuple):
+    """Encoded Page JSON for one view, valid only for the Article it was rendered from"""
+    article: "weakref.ReferenceType[Article]"
+    body: bytes
+    etag: str  # Strong validator of ``body``
+    encoded: Dict[str, bytes]  # Content-Encoding -> compressed body
+
+CITATION_SPAN_RE = re.compile(f"{CITATION_OPEN}[^{CITATION_CLOSE}]*{CITATION_CLOSE}")
+# get_text() emits each marker as its own segment, so drop it with its separator
+CITATION_MARKER_RE = re.compile(f"{CITATION_OPEN}\n\n|\n\n{CITATION_CLOSE}|[{CITATION_OPEN}{CITATION_CLOSE}]")
+
+def serialize_article(article: Article) -> bytes:
+    """Compact blob for the shared cache tier and snapshots"""
+    return zlib.compress(json.dumps(article.to_dict(), ensure_ascii=False).encode("utf-8"))
+
+def deserialize_article(blob: bytes) -> Article:
+    data = json.loads(zlib.decompress(blob))
+    if "references" in data:  # Written before reference URLs were packed
+        data["reference_urls"] = [reference["url"] for reference in data.pop("references")]
+    return Article(**data)
+
 def normalize_slug(input_str: str) -> str:
     # FastAPI and query params automatically decode %26 to &
     # Handle potential double-encoding from browser address bar (e.g., typing "at%26t" sends "at%2526t", decoded to "at%26t")
@@ -125,81 +530,172 @@ def normalize_slug(input_str: str) -> str:
     # Return exact slug - frontend handles mapping logic
     return normalized
 
-def find_content_div(soup: BeautifulSoup) -> BeautifulSoup:
-    div = soup.select_one('article.prose')  # Primary
-    if div:
-        return div
-    selectors = ['div.content', 'main', 'article']
-    for sel in selectors:
-        div = soup.select_one(sel)
-        if div:
-            return div
-    return soup.body
-
 def extract_references(soup: BeautifulSoup) -> tuple[List[Reference], int]:
-    # First, try to find <div id="references">
-    refs_div = soup.find('div', id='references')
-    if refs_div:
-        # Look for ol/ul inside refs_div
-        ol = refs_div.find('ol') or refs_div.find('ul')
-        if ol:
-            list_items = ol.find_all('li', recursive=True)
-        else:
-            # Fallback: direct li children of div
-            list_items = refs_div.find_all('li', recursive=True)
-    else:
-        # Fallback: search entire soup for ol with references/citations class
-        ol = soup.find('ol', class_=re.compile(r'references?|citations?', re.I))
-        if ol:
-            list_items = ol.find_all('li', recursive=True)
-        else:
-            return [], 0
-    
-    references = []
-    for i, li in enumerate(list_items, 1):
-        # Extract hrefs that are http or //, take first as singular URL
-        urls = []
-        for a in li.find_all('a', href=True):
-            href = a.get('href')
-            if href and (href.startswith(('http', '//'))):
-                urls.append(urljoin(BASE_URL, href))
-        url = urls[0] if urls else ""
-        references.append(Reference(number=i, url=url))
-    
+    # Take the first http or // link of each reference list item as its URL
+    references = [Reference(number=i, url=url) for i, url in enumerate(extract_reference_urls(soup), 1)]
     return references, len(references)
 
-def get_size(obj, seen=None):
-    """Recursively find size of objects"""
-    size = sys.getsizeof(obj)
-    if seen is None:
-        seen = set()
-    obj_id = id(obj)
-    if obj_id in seen:
-        return 0
-    seen.add(obj_id)
-    if isinstance(obj, dict):
-        size += sum([get_size(k, seen) + get_size(v, seen) for k, v in obj.items()])
-    elif hasattr(obj, '__dict__'):
-        size += get_size(obj.__dict__, seen)
-    if hasattr(obj, '__iter__') and not isinstance(obj, (str, bytes, tuple)):
-        size += sum([get_size(i, seen) for i in obj])
-    return size
+def build_article(parsed: ParsedPage, slug: str, url: str) -> Article:
+    return Article(title=parsed.title, slug=slug, url=url, content_text=parsed.content_text,
+                   reference_urls=parsed.reference_urls)
+
+def parse_article(html: str, slug: str, url: str) -> Article:
+    """Parse page HTML into the canonical cached Article (on the calling thread)"""
+    return build_article(parse_html(html, slug, HTML_PARSER), slug, url)
+
+def strip_citations(text: str, keep: bool) -> str:
+    """Remove citation markers from ``text``, keeping or dropping the cited text"""
+    if keep:
+        text = CITATION_MARKER_RE.sub("", text)
+    else:
+        text = CITATION_SPAN_RE.sub("", text)
+    return re.sub(r'\n{3,}', '\n\n', text).strip("\n")
+
+def render_page(article: Article, extract_refs: bool, truncate: Optional[int], citations: bool) -> Page:
+    """Build the requested Page view from a cached Article"""
+    content_text = strip_citations(article.content_text, keep=citations)
+    if truncate:
+        content_text = content_text[:truncate]
+
+    words = len(re.split(r'\s+', content_text.strip()))
+
+    references = article.references if extract_refs else []
+
+    # Title is joined without separators, so markers are plain characters
+    title = article.title if citations else CITATION_SPAN_RE.sub("", article.title)
+    title = title.replace(CITATION_OPEN, "").replace(CITATION_CLOSE, "")
+
+    page_dict = {
+        "title": title,
+        "slug": article.slug,
+        "url": article.url,
+        "content_text": content_text,
+        "char_count": len(content_text),
+        "word_count": words,
+        "references_count": len(references),
+        "references": references,
+    }
+    return Page(**page_dict)
+
+async def render_page_json(article: Article, extract_refs: bool, truncate: Optional[int], citations: bool) -> RenderedPage:
+    """Page JSON for a view of ``article``, rendered and encoded once per article and view"""
+    key = (article.slug, extract_refs, truncate, citations)
+    rendered = _response_cache.get(key)
+    # A refreshed article is a new object, so views of the old one are re-rendered
+    if rendered is not None and rendered.article() is article:
+        return rendered
+    # Rendering a large page and compressing it three ways takes milliseconds: keep it off the loop
+    rendered = await asyncio.to_thread(render_view, article, extract_refs, truncate, citations)
+    _response_cache.set(key, rendered)
+    return rendered
+
+def render_view(article: Article, extract_refs: bool, truncate: Optional[int], citations: bool) -> RenderedPage:
+    body = render_page(article, extract_refs, truncate, citations).model_dump_json().encode("utf-8")
+    etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+    return RenderedPage(weakref.ref(article), body, etag, compress_variants(body))
+
+def compress_variants(body: bytes) -> Dict[str, bytes]:
+    """Compressed copies of ``body`` in each configured encoding that actually makes it smaller"""
+    if len(body) < COMPRESS_MIN_BYTES:
+        return {}
+    variants = {}
+    for encoding in RESPONSE_ENCODINGS:
+        compressed = compress(body, encoding)
+        if len(compressed) < len(body):
+            variants[encoding] = compressed
+    return variants
+
+async def compressed_response(body: bytes, media_type: str, accept_encoding: Optional[str]) -> Response:
+    """Response for a body that isn't cached, compressed on the fly (in a thread) when worthwhile"""
+    headers = {"Vary": "Accept-Encoding"}
+    encoding = negotiate(accept_encoding, RESPONSE_ENCODINGS) if len(body) >= COMPRESS_MIN_BYTES else None
+    if encoding is not None:
+        body = await asyncio.to_thread(compress, body, encoding)
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type=media_type, headers=headers)
+
+def representation_etag(etag: str, encoding: Optional[str]) -> str:
+    """Strong ETags differ per Content-Encoding, since the bytes differ"""
+    return etag if encoding is None else f'{etag[:-1]}-{encoding}"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header matches ``etag`` (weak comparison, as RFC 9110 requires)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in if_none_match.split(","))
+
+def cache_headers(slug: str, article: Article, etag: str) -> dict:
+    """ETag, Cache-Control and Age for a page, so clients and CDNs can reuse it until it expires"""
+    entry = _cache.peek(slug)
+    age = int(_cache.age(entry)) if entry is not None and entry.value is article else 0
+    max_age = max(0, int(CACHE_TTL.total_seconds()) - age)
+    stale = max(0, int((CACHE_TTL + CACHE_STALE_TTL).total_seconds()) - max(age, int(CACHE_TTL.total_seconds())))
+    return {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={max_age}, stale-while-revalidate={stale}",
+        "Age": str(age),
+    }
+
+def start_flight(key: str, load) -> asyncio.Task:
+    """Return the in-flight task for ``key``, starting ``load()`` if there is none"""
+    task = _inflight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(load())
+        _inflight[key] = task
+
+        def _done(finished, key=key):
+            if _inflight.get(key) is finished:
+                del _inflight[key]
+
+        task.add_done_callback(_done)
+    else:
+        logger.debug("Joining in-flight fetch for %s", key)
+    return task
+
+def single_flight(key: str, load):
+    """Share one in-flight load per key between concurrent callers.
+
+    The first caller starts ``load()`` as a task; callers arriving before it
+    finishes await the same task and receive the same result or exception.
+    The task is shielded so a disconnecting client doesn't cancel the fetch
+    for everyone else.
+    """
+    return asyncio.shield(start_flight(key, load))
+
+def schedule_refresh(slug: str, entry: CacheEntry):
+    """Revalidate a stale or soon-to-expire article in the background"""
+    if slug in _inflight:
+        return
+    # Back off after a failure, so an unreachable upstream isn't hit on every request for the page
+    if _cache.clock() - entry.refresh_failed_at < CACHE_REFRESH_RETRY.total_seconds():
+        return
+    logger.info(f"Scheduling background refresh for {slug}")
+
+    async def refresh():
+        stop_recording()  # Not part of the request that triggered it
+        return await load_article(slug, previous=entry.value, previous_stored_at=entry.stored_at)
+
+    task = start_flight(slug, refresh)
+    task.add_done_callback(functools.partial(_log_refresh_result, slug, entry))
+
+def _log_refresh_result(slug: str, entry: CacheEntry, task: asyncio.Task):
+    # Retrieving the exception also stops asyncio warning that it was never retrieved
+    if not task.cancelled() and task.exception() is not None:
+        entry.refresh_failed_at = _cache.clock()
+        logger.warning(f"Background refresh failed for {slug} - serving cached copy until the next retry "
+                       f"in {int(CACHE_REFRESH_RETRY.total_seconds())}s: {task.exception()!r}")
 
 def get_cache_size_bytes():
-    """Calculate total memory size of the cache in bytes"""
-    total = 0
-    for key, value in _cache.items():
-        page, ts = value
-        total += get_size(key) + get_size(value)  # key is str, value is tuple (Page, datetime)
-    return total
-
-def get_cached_slugs():
-    """Extract unique slugs from cache keys"""
-    slugs = set()
-    for key in _cache:
-        slug = key.split(':')[0]  # First part is slug
-        slugs.add(slug)
-    return sorted(list(slugs))  # Sort alphabetically for consistency
+    """Total memory size of the cache in bytes (tracked by the cache on insert/evict)"""
+    return _cache.total_bytes
+
+def get_cached_slugs(offset: int = 0, limit: Optional[int] = None) -> List[str]:
+    """Cached slugs in alphabetical order, optionally one page of them"""
+    slugs = sorted(_cache.keys())
+    return slugs[offset:] if limit is None else slugs[offset:offset + limit]
 
 @app.get("/", response_class=HTMLResponse, include_in_schema=False)
 async def read_root():
@@ -214,88 +710,374 @@ async def read_root():
             status_code=404
         )
 
-@app.get("/page/{slug:path}", response_model=Page, dependencies=[Depends(rate_limit_dependency), Depends(verify_api_key)])
+@app.get("/page/{slug:path}", response_model=Page, dependencies=API_DEPENDENCIES)
 async def get_page(
+    request: Request,
     slug: str,
     extract_refs: bool = Query(True),
     truncate: Optional[int] = Query(None),
     citations: bool = Query(False)
 ):
-    logger.info(f"GET /page/{slug} - extract_refs={extract_refs}, truncate={truncate}, citations={citations}")
+    logger.debug("GET /page/%s - extract_refs=%s, truncate=%s, citations=%s", slug, extract_refs, truncate, citations)
     slug = normalize_slug(slug)
+    article = await resolve_article(slug)
+    with RENDER_DURATION.time(), server_timing("render"):
+        rendered = await render_page_json(article, extract_refs, truncate, citations)
+    encoding = negotiate(request.headers.get("accept-encoding"), rendered.encoded)
+    etag = representation_etag(rendered.etag, encoding)
+    headers = cache_headers(slug, article, etag)
+    headers["Vary"] = "Accept-Encoding"
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    body = rendered.body
+    if encoding is not None:
+        body = rendered.encoded[encoding]
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type="application/json", headers=headers)
+
+@app.post("/pages", response_model=PageBatch, dependencies=BATCH_DEPENDENCIES)
+async def get_pages(request: Request, batch: PageBatchRequest, api_key: ApiKey = Depends(verify_api_key)):
+    """Fetch many articles in one request.
+
+    Cache hits are rendered immediately; misses are fetched concurrently, at
+    most BATCH_CONCURRENCY at a time. Results keep the request order and a
+    failing slug only fails its own entry. Each slug counts as one request
+    against the rate limit.
+    """
+    logger.info("POST /pages - %d slugs, extract_refs=%s, truncate=%s, citations=%s",
+                len(batch.slugs), batch.extract_refs, batch.truncate, batch.citations)
+    await asyncio.to_thread(charge_rate_limit, request, api_key, len(batch.slugs))
+    release = acquire_concurrency_slot(api_key)
+    try:
+        semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+        results = await asyncio.gather(*(resolve_page_result(slug, batch, semaphore) for slug in batch.slugs))
+    finally:
+        release()
+    return PageBatch(results=results)
+
+@app.post("/pages/stream", dependencies=BATCH_DEPENDENCIES)
+async def stream_pages(request: Request, batch: PageStreamRequest, api_key: ApiKey = Depends(verify_api_key)):
+    """Stream results as NDJSON (one PageResult per line) in completion order.
+
+    At most BATCH_CONCURRENCY slugs are being resolved at any time and each
+    result is written out as soon as it is ready, so server memory stays
+    bounded however many slugs are requested. Each slug counts as one request
+    against the rate limit, so a stream can't be longer than the key's limit.
+    """
+    logger.info("POST /pages/stream - %d slugs, extract_refs=%s, truncate=%s, citations=%s",
+                len(batch.slugs), batch.extract_refs, batch.truncate, batch.citations)
+    await asyncio.to_thread(charge_rate_limit, request, api_key, len(batch.slugs))
+    release = acquire_concurrency_slot(api_key)
+
+    async def ndjson_lines():
+        pending_slugs = iter(batch.slugs)
+        running = set()
+        try:
+            while True:
+                for slug in itertools.islice(pending_slugs, BATCH_CONCURRENCY - len(running)):
+                    running.add(asyncio.ensure_future(resolve_page_result(slug, batch)))
+                if not running:
+                    return
+                done, running = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield task.result().model_dump_json() + "\n"
+        finally:
+            # Client went away: stop resolving (shared upstream fetches keep running)
+            for task in running:
+                task.cancel()
+            release()
+
+    # The background task also releases the slot if the body never started (early disconnect)
+    return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson", background=BackgroundTask(release))
 
-    cache_key = f"{slug}:{extract_refs}:{truncate or 'full'}:{citations}"
-    now = datetime.now()
+async def resolve_page_result(
+    requested: str, options: PageBatchRequest, semaphore: Optional[asyncio.Semaphore] = None
+) -> PageResult:
+    """Render one slug of a batch, turning any error into a per-slug result.
 
-    if cache_key in _cache:
-        page, ts = _cache[cache_key]
-        if now - ts > CACHE_TTL:
-            logger.info(f"Cache expired for {slug} (age: {now - ts})")
-            _cache.pop(cache_key)
+    Misses wait for ``semaphore`` (if given) before loading; hits never do.
+    """
+    slug = normalize_slug(requested)
+    try:
+        if semaphore is None or _cache.is_servable(slug):
+            article = await resolve_article(slug)
         else:
-            logger.info(f"Cache HIT for {slug} (age: {now - ts})")
-            return page
-    
-    logger.info(f"Cache MISS for {slug} - fetching from Grokipedia")
+            async with semaphore:
+                article = await resolve_article(slug)
+        with RENDER_DURATION.time(), server_timing("render"):
+            page = render_page(article, options.extract_refs, options.truncate, options.citations)
+    except HTTPException as e:
+        return PageResult(slug=requested, status=e.status_code, error=e.detail)
+    except Exception as e:
+        # Anything unexpected fails this slug only, not the whole batch or stream
+        logger.exception(f"Error resolving {slug} in batch")
+        return PageResult(slug=requested, status=500, error=f"Internal error: {type(e).__name__}")
+    return PageResult(slug=requested, status=200, page=page)
+
+async def resolve_article(slug: str) -> Article:
+    """Cached article for a normalized slug, loading it (once across callers) on a miss"""
+    # One cache entry per article; query params only select a view of it
+    with server_timing("cache"):
+        entry = _cache.get_entry(slug, allow_stale=True)
+    if entry is not None:
+        age = _cache.age(entry)
+        logger.debug("Cache HIT for %s (age: %ds)", slug, age)
+        if age > (CACHE_TTL - CACHE_REFRESH_AHEAD).total_seconds():
+            schedule_refresh(slug, entry)
+        return entry.value
+    return await single_flight(slug, lambda: load_article(slug))
+
+async def load_article(slug: str, previous: Optional[Article] = None, previous_stored_at: float = 0) -> Article:
+    """Fetch, parse and cache an article on a cache miss, or revalidate ``previous``.
+
+    A refresh first tries to avoid downloading the page: a fresh, newer copy
+    in the shared tier is used as is, an unchanged sitemap lastmod just
+    extends the TTL, and otherwise Grokipedia is asked with If-None-Match /
+    If-Modified-Since so a 304 extends the TTL without parsing.
+    """
+    with server_timing("shared"):
+        article = await read_shared_cache(slug, previous_stored_at)
+    if article is not None:
+        return article
+
     url = f"{BASE_URL}/page/{urllib.parse.quote(slug)}"
+    headers = {}
+    if previous is not None:
+        if await sitemap_unchanged_since(slug, previous_stored_at):
+            logger.info(f"Sitemap shows {slug} unchanged - extending TTL without fetching")
+            return await extend_ttl(slug, previous)
+        if previous.etag:
+            headers["If-None-Match"] = previous.etag
+        if previous.last_modified:
+            headers["If-Modified-Since"] = previous.last_modified
+        logger.info(f"Revalidating {slug} with Grokipedia (conditional={bool(headers)})")
+    else:
+        logger.info("Cache MISS for %s - fetching from Grokipedia", slug)
 
     try:
-        resp = requests.get(url, headers={"User-Agent": "Grokipedia-API/0.1"}, timeout=10)
-        logger.info(f"Grokipedia response for {slug}: {resp.status_code}")
+        with server_timing("fetch"):
+            resp = await fetch_upstream(url, headers=headers or None)
+        logger.debug("Grokipedia response for %s: %s", slug, resp.status_code)
+        if resp.status_code == 304 and previous is not None:
+            return await extend_ttl(slug, previous)
         if resp.status_code != 200:
             logger.warning(f"Page not found: {slug} (status {resp.status_code})")
             raise HTTPException(status_code=404, detail=f"Not found: {slug}")
-    except requests.RequestException as e:
+    except httpx.HTTPError as e:
         logger.error(f"Error fetching {slug} from Grokipedia: {str(e)}")
         raise HTTPException(status_code=502, detail=f"Failed to fetch from Grokipedia: {str(e)}")
-    
-    soup = BeautifulSoup(resp.text, "html.parser")
-    
-    # Clean up: remove unwanted tags, but preserve references div
-    unwanted_tags = ["script", "style", "nav", "header", "footer", "aside"]
-    if not citations:
-        unwanted_tags.append("sup")
-    for tag in soup(unwanted_tags):
-        tag.decompose()
-    
-    content_div = find_content_div(soup)
-
-    h1 = content_div.find("h1")
-    page_title = h1.get_text(strip=True) if h1 else slug.replace("_", " ")
-
-    # Extract ALL content text - frontend will truncate for display
-    content_text = re.sub(r'\n{3,}', '\n\n', content_div.get_text(separator="\n\n", strip=True))
-    if truncate:
-        content_text = content_text[:truncate]
-    
-    words = len(re.split(r'\s+', content_text.strip()))
-    
-    references, refs_count = extract_references(soup) if extract_refs else ([], 0)
-    
-    page_dict = {
-        "title": page_title,
-        "slug": slug,
-        "url": url,
-        "content_text": content_text,
-        "char_count": len(content_text),
-        "word_count": words,
-        "references_count": refs_count,
-        "references": references,
-    }
-    page = Page(**page_dict)
-    
-    # Cache the new page (evict oldest if at max size)
-    if len(_cache) >= MAX_CACHE_SIZE:
-        evicted_key = next(iter(_cache))
-        _cache.popitem(last=False)  # Evict oldest (FIFO)
-        logger.info(f"Cache full - evicted oldest entry: {evicted_key}")
-    _cache[cache_key] = (page, now)
-    logger.info(f"Cached page {slug} (cache size: {len(_cache)}/{MAX_CACHE_SIZE})")
-
-    return page
-
-@app.get("/sitemap-index", dependencies=[Depends(rate_limit_dependency), Depends(verify_api_key)])
-async def get_sitemap_index():
+
+    # Content div lookup and reference extraction run inside the parse worker
+    try:
+        with PARSE_DURATION.time(engine=HTML_PARSER), server_timing("parse"):
+            parsed = await parse_pool.parse(resp.content, resp.encoding or "utf-8", slug, HTML_PARSER)
+    except Exception as e:
+        # Includes BrokenProcessPool when a parse worker dies; the pool restarts on the next parse
+        logger.error(f"Error parsing {slug}: {type(e).__name__}: {str(e)}")
+        raise HTTPException(status_code=502, detail=f"Failed to parse Grokipedia page: {slug}")
+    with server_timing("build"):
+        article = build_article(parsed, slug, url)
+    article.etag = resp.headers.get("etag")
+    article.last_modified = resp.headers.get("last-modified")
+
+    # Cache the new article (least recently used entries are evicted to stay within the byte budget)
+    with server_timing("store"):
+        if not _cache.set(slug, article):
+            logger.warning(f"Page {slug} exceeds the cache budget ({MAX_CACHE_BYTES} bytes) - not cached")
+        logger.debug("Cached page %s (cache size: %d items, %d/%d bytes)",
+                     slug, len(_cache), _cache.total_bytes, MAX_CACHE_BYTES)
+        await write_shared_cache(slug, article)
+
+    return article
+
+async def extend_ttl(slug: str, article: Article) -> Article:
+    """Mark an unchanged article as freshly validated in both cache tiers"""
+    now = _cache.clock()
+    if not _cache.touch(slug, now):
+        _cache.set(slug, article, stored_at=now)
+    await write_shared_cache(slug, article, now)
+    return article
+
+async def sitemap_unchanged_since(slug: str, fetched_at: float) -> bool:
+    """True if the slug sync saw the article's sitemap lastmod no later than our fetch.
+
+    Only trusted when the sync ran after ``fetched_at``; otherwise the article
+    may have changed since the last sync.
+    """
+    if not (SUPABASE_URL and SUPABASE_KEY):
+        return False
+    try:
+        resp = await get_http_client().get(
+            f"{SUPABASE_URL}/rest/v1/grokipedia_slugs",
+            params={"slug": f"eq.{slug}", "select": "last_modified,updated_at"},
+            headers={"apikey": SUPABASE_KEY, "Authorization": f"Bearer {SUPABASE_KEY}"},
+            timeout=SITEMAP_LOOKUP_TIMEOUT,
+        )
+        rows = resp.json() if resp.status_code == 200 else []
+    except (httpx.HTTPError, ValueError) as e:
+        logger.warning(f"Sitemap lastmod lookup failed for {slug}: {str(e)}")
+        return False
+    if not rows or not rows[0].get("last_modified") or not rows[0].get("updated_at"):
+        return False
+    last_modified = parse_timestamp(rows[0]["last_modified"])
+    synced_at = parse_timestamp(rows[0]["updated_at"])
+    if last_modified is None or synced_at is None:
+        return False
+    return last_modified <= fetched_at < synced_at
+
+async def load_cache_snapshot():
+    """Fill the cache from CACHE_SNAPSHOT_PATH, keeping each page's fetch time and hit count.
+
+    Pages past the stale window are skipped; stale ones are served and
+    refreshed as usual. Decoding runs in a thread; inserting is cheap.
+    """
+    expired_before = _cache.clock() - (CACHE_TTL + CACHE_STALE_TTL).total_seconds()
+
+    def decode():
+        return [
+            (record, deserialize_article(record.value))
+            for record in read_snapshot(CACHE_SNAPSHOT_PATH) if record.stored_at > expired_before
+        ]
+
+    started = time.perf_counter()
+    try:
+        records = await asyncio.to_thread(decode)
+    except FileNotFoundError:
+        return
+    except (OSError, ValueError, zlib.error) as e:
+        logger.warning(f"Could not load cache snapshot {CACHE_SNAPSHOT_PATH}: {str(e)}")
+        return
+    for record, article in records:  # Least recently used first, so LRU order is kept
+        if _cache.set(record.key, article, stored_at=record.stored_at):
+            _cache.peek(record.key).hits = record.hits
+    logger.info(f"Loaded {len(records)} pages from cache snapshot in {time.perf_counter() - started:.2f}s")
+
+async def save_cache_snapshot():
+    """Write every cached page to CACHE_SNAPSHOT_PATH (encoded in a thread)"""
+    entries = [(slug, entry.value, entry.stored_at, entry.hits) for slug, entry in _cache.items()]
+
+    def encode():
+        return write_snapshot(CACHE_SNAPSHOT_PATH, (
+            SnapshotRecord(slug, serialize_article(article), stored_at, hits)
+            for slug, article, stored_at, hits in entries
+        ))
+
+    try:
+        count = await asyncio.to_thread(encode)
+    except OSError as e:
+        logger.warning(f"Could not save cache snapshot to {CACHE_SNAPSHOT_PATH}: {str(e)}")
+        return
+    logger.info(f"Saved {count} pages to cache snapshot {CACHE_SNAPSHOT_PATH}")
+
+async def fetch_topic_mappings(limit: int) -> List[str]:
+    """Slugs of the curated Wikipedia topic -> Grokipedia mappings"""
+    if not (SUPABASE_URL and SUPABASE_KEY):
+        logger.warning("Warm-up source topic-mappings needs SUPABASE_URL and SUPABASE_ANON_KEY - skipped")
+        return []
+    try:
+        resp = await get_http_client().get(
+            f"{SUPABASE_URL}/rest/v1/topic_mappings",
+            params={"select": "grokipedia_slug", "limit": str(limit)},
+            headers={"apikey": SUPABASE_KEY, "Authorization": f"Bearer {SUPABASE_KEY}"},
+        )
+        rows = resp.json() if resp.status_code == 200 else []
+    except (httpx.HTTPError, ValueError) as e:
+        logger.warning(f"Topic mappings lookup failed: {str(e)}")
+        return []
+    return [row["grokipedia_slug"] for row in rows if row.get("grokipedia_slug")]
+
+async def collect_warmup_slugs(sources: List[str], limit: int) -> List[str]:
+    """Normalized slugs from ``sources`` in order, de-duplicated, at most ``limit``"""
+    slugs: List[str] = []
+    for source in sources:
+        try:
+            if source == "hits":
+                slugs += warmup.read_hit_counts(HIT_COUNTS_FILE) if HIT_COUNTS_FILE else []
+            elif source == "seed-topics":
+                slugs += warmup.read_seed_topics()
+            elif source == "topic-mappings":
+                slugs += await fetch_topic_mappings(limit)
+            elif source == "file":
+                slugs += warmup.read_slug_file(WARMUP_SLUGS_FILE) if WARMUP_SLUGS_FILE else []
+            else:
+                logger.warning(f"Unknown warm-up source {source!r} (expected one of {', '.join(warmup.SOURCES)})")
+        except (OSError, ValueError) as e:
+            logger.warning(f"Warm-up source {source} unavailable: {str(e)}")
+    return warmup.unique(normalize_slug(slug) for slug in slugs)[:limit]
+
+async def warm_slug(slug: str):
+    """Load ``slug`` into the cache unless it's already there (without counting a hit)"""
+    if slug not in _cache:
+        await single_flight(slug, lambda: load_article(slug))
+
+async def warm_up(sources: List[str], limit: int, concurrency: int) -> dict:
+    slugs = await collect_warmup_slugs(sources, limit)
+    logger.info(f"Warming the cache with {len(slugs)} slugs from {', '.join(sources)}")
+    stats = await warmup.warm(slugs, warm_slug, concurrency)
+    logger.info(f"Warm-up finished: {stats}")
+    return stats
+
+async def save_hit_counts():
+    """Write per-slug hit counts to HIT_COUNTS_FILE (written in a thread)"""
+    # Collected on the loop: loads and refreshes still running would change the cache mid-iteration
+    counts = {slug: entry.hits for slug, entry in _cache.items() if entry.hits}
+    try:
+        await asyncio.to_thread(warmup.write_hit_counts, HIT_COUNTS_FILE, counts, WARMUP_LIMIT)
+    except OSError as e:
+        logger.warning(f"Could not save hit counts to {HIT_COUNTS_FILE}: {str(e)}")
+
+def parse_timestamp(value: str) -> Optional[float]:
+    """Epoch seconds from an ISO 8601 date/datetime (naive values are UTC)"""
+    try:
+        dt = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+async def read_shared_cache(slug: str, newer_than: float = 0) -> Optional[Article]:
+    """Look up a fresh copy in the shared tier, promoting a hit into this worker's cache"""
+    if _shared_store is None:
+        return None
+
+    def fetch() -> Optional[Tuple[Article, float]]:
+        # Decompressing and decoding a large article is too slow for the event loop
+        hit = _shared_store.get(slug)
+        if hit is None:
+            return None
+        blob, stored_at = hit
+        if stored_at <= newer_than or time.time() - stored_at > CACHE_TTL.total_seconds():
+            return None
+        return deserialize_article(blob), stored_at
+
+    try:
+        hit = await asyncio.to_thread(fetch)
+    except sqlite3.Error as e:
+        logger.warning(f"Shared cache read failed for {slug}: {str(e)}")
+        return None
+    if hit is None:
+        return None
+    article, stored_at = hit
+    _cache.set(slug, article, stored_at=stored_at)  # Keep the original fetch time so TTLs line up
+    logger.debug("Shared cache HIT for %s", slug)
+    return article
+
+async def write_shared_cache(slug: str, article: Article, stored_at: Optional[float] = None):
+    if _shared_store is None:
+        return
+
+    def store():
+        # Serialized in the worker thread as well: encoding a large article is too slow for the event loop
+        _shared_store.set(slug, serialize_article(article), stored_at)
+
+    try:
+        await asyncio.to_thread(store)
+    except sqlite3.Error as e:
+        logger.warning(f"Shared cache write failed for {slug}: {str(e)}")
+
+@app.get("/sitemap-index", dependencies=API_DEPENDENCIES)
+async def get_sitemap_index(request: Request):
     """
     Fetch Grokipedia's sitemap index XML.
     Used by sync script to get list of all sitemap URLs.
@@ -304,20 +1086,20 @@ async def get_sitemap_index():
     sitemap_index_url = "https://assets.grokipedia.com/sitemap/sitemap-index.xml"
 
     try:
-        resp = requests.get(sitemap_index_url, timeout=10)
-        logger.info(f"Sitemap index response: {resp.status_code} ({len(resp.text)} bytes)")
+        resp = await fetch_upstream(sitemap_index_url)
+        logger.info(f"Sitemap index response: {resp.status_code} ({len(resp.content)} bytes)")
         if resp.status_code != 200:
             logger.warning(f"Failed to fetch sitemap index (status {resp.status_code})")
             raise HTTPException(status_code=502, detail=f"Failed to fetch sitemap index (status {resp.status_code})")
 
-        return HTMLResponse(content=resp.text, media_type="application/xml")
-    except requests.RequestException as e:
+        return await compressed_response(resp.content, "application/xml", request.headers.get("accept-encoding"))
+    except httpx.HTTPError as e:
         logger.error(f"Error fetching sitemap index: {str(e)}")
         raise HTTPException(status_code=502, detail=f"Failed to fetch sitemap index: {str(e)}")
 
 
-@app.get("/sitemap", dependencies=[Depends(rate_limit_dependency), Depends(verify_api_key)])
-async def get_sitemap(url: str = Query(..., description="Sitemap URL to fetch")):
+@app.get("/sitemap", dependencies=API_DEPENDENCIES)
+async def get_sitemap(request: Request, url: str = Query(..., description="Sitemap URL to fetch")):
     """
     Fetch individual sitemap XML file.
     Used by sync script to get article slugs from each sitemap.
@@ -330,21 +1112,20 @@ async def get_sitemap(url: str = Query(..., description="Sitemap URL to fetch"))
         raise HTTPException(status_code=400, detail="Invalid sitemap URL (must be from assets.grokipedia.com)")
 
     try:
-        resp = requests.get(url, timeout=10)
-        logger.info(f"Sitemap response for {url}: {resp.status_code} ({len(resp.text)} bytes)")
+        resp = await fetch_upstream(url)
+        logger.info(f"Sitemap response for {url}: {resp.status_code} ({len(resp.content)} bytes)")
         if resp.status_code != 200:
             logger.warning(f"Failed to fetch sitemap (status {resp.status_code})")
             raise HTTPException(status_code=502, detail=f"Failed to fetch sitemap (status {resp.status_code})")
 
-        return HTMLResponse(content=resp.text, media_type="application/xml")
-    except requests.RequestException as e:
+        return await compressed_response(resp.content, "application/xml", request.headers.get("accept-encoding"))
+    except httpx.HTTPError as e:
         logger.error(f"Error fetching sitemap from {url}: {str(e)}")
         raise HTTPException(status_code=502, detail=f"Failed to fetch sitemap: {str(e)}")
 
 
-@app.get("/health", include_in_schema=False)
-async def health(key: str = Query(..., description="Secret key for health endpoint access")):
-    logger.info("Health check requested")
+def verify_health_key(key: str):
+    """Check the secret guarding the operational endpoints (/health, /metrics)"""
     health_secret = os.getenv("HEALTH_SECRET")  # Load from .env
     if not health_secret:
         logger.error("Health secret not configured in .env")
@@ -352,17 +1133,41 @@ async def health(key: str = Query(..., description="Secret key for health endpoi
     if key != health_secret:
         logger.warning("Unauthorized health check attempt")
         raise HTTPException(status_code=401, detail="Unauthorized access to health endpoint")
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics(key: str = Query(..., description="Secret key (HEALTH_SECRET)")):
+    """Prometheus text exposition of this worker's metrics"""
+    verify_health_key(key)
+    return Response(content=metrics.render(), media_type=METRICS_CONTENT_TYPE)
+
+@app.get("/health", include_in_schema=False)
+async def health(
+    key: str = Query(..., description="Secret key for health endpoint access"),
+    include_slugs: bool = Query(False, description="List cached slugs (sorts the whole cache; not for probes)"),
+    slugs_offset: int = Query(0, ge=0),
+    slugs_limit: int = Query(100, ge=1, le=1000),
+):
+    logger.debug("Health check requested")
+    verify_health_key(key)
+    # Everything below is O(1): sizes and counters are maintained by the cache itself
     cache_size_bytes = get_cache_size_bytes()
     cache_size_mb = round(cache_size_bytes / (1024 * 1024), 2)
-    cached_slugs = get_cached_slugs()
-    return {
+    result = {
         "status": "Live",
         "cached_items": len(_cache),
+        "cache_stats": _cache.stats(),
+        "response_cache_stats": _response_cache.stats(),
+        "parse_pool": parse_pool.stats(),
+        "rate_limiter": rate_limiter.stats(),
         "cache_size_bytes": cache_size_bytes,
         "cache_size_mb": cache_size_mb,
-        "cached_slugs": cached_slugs,
         "timestamp": datetime.now().isoformat()
     }
+    if include_slugs:
+        result["cached_slugs"] = get_cached_slugs(slugs_offset, slugs_limit)
+        next_offset = slugs_offset + slugs_limit
+        result["cached_slugs_next_offset"] = next_offset if next_offset < len(_cache) else None
+    return result
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,304 @@
+"""
+Per-client rate limiting with constant cost per request and bounded memory,
+optionally sharing counts between worker processes through a SQLite file.
+"""
+import logging
+import math
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Iterable, Optional, Tuple
+
+from cache import thread_connection
+
+logger = logging.getLogger(__name__)
+
+
+class _ClientWindow:
+    __slots__ = ("window", "previous", "current", "pending", "last_seen")
+
+    def __init__(self, window: int, last_seen: float):
+        self.window = window  # Index of the fixed window ``current`` counts
+        self.previous = 0  # Requests counted in the window before it
+        self.current = 0
+        self.pending = 0  # Part of ``current`` not yet added to the shared store
+        self.last_seen = last_seen
+
+
+class SlidingWindowLimiter:
+    """Sliding-window counter limiter: at most ``limit`` requests per ``window`` seconds.
+
+    Each client keeps two counters, for the current and the previous fixed
+    window; the previous one is weighted by how much of it still overlaps the
+    sliding window. That is O(1) per request however high ``limit`` is.
+
+    Clients are kept in least-recently-seen order, so idle ones (no request
+    for two windows, i.e. nothing left to count) are dropped from the front as
+    part of normal calls. At most ``max_clients`` are tracked; beyond that the
+    least recently seen client is forgotten early, which can only make the
+    limiter more lenient towards it.
+
+    With a ``store`` the counts are shared: requests are counted locally and
+    added to the store in one batch at most every ``flush_interval`` seconds,
+    by whichever request finds a flush due, which also brings back the
+    totals from all workers. Between flushes a client can exceed the limit by
+    what other workers let through in that interval.
+    """
+
+    def __init__(
+        self,
+        limit: int,
+        window: float,
+        max_clients: int = 100_000,
+        clock: Callable[[], float] = time.time,
+        store: Optional["SQLiteCounterStore"] = None,
+        flush_interval: float = 0.5,
+    ):
+        self.limit = limit
+        self.window = window
+        self.max_clients = max_clients
+        self.clock = clock
+        self.store = store
+        self.flush_interval = flush_interval
+        self._clients: "OrderedDict[Hashable, _ClientWindow]" = OrderedDict()
+        self._dirty: Dict[Hashable, _ClientWindow] = {}  # Clients with pending counts
+        self._lock = threading.Lock()  # Dependencies run on the threadpool
+        self._flush_lock = threading.Lock()
+        self._last_flush = clock()
+        self.allowed = 0
+        self.rejected = 0
+        self.idle_evictions = 0
+        self.capacity_evictions = 0
+        self.flushes = 0
+        self.flush_errors = 0
+
+    def __len__(self) -> int:
+        return len(self._clients)
+
+    def hit(self, key: Hashable, limit: Optional[int] = None, cost: int = 1) -> bool:
+        """Count a request from ``key``; False if it is over the limit (and not counted).
+
+        ``limit`` overrides the default limit for this key (e.g. per API key tiers).
+        ``cost`` charges the request as that many requests (e.g. one per page of
+        a batch); it is allowed only if all of them fit.
+        """
+        with self._lock:
+            allowed = self._hit(key, self.clock(), self.limit if limit is None else limit, cost)
+        if self.store is not None and self.clock() - self._last_flush >= self.flush_interval:
+            self.flush(blocking=False)
+        return allowed
+
+    def _hit(self, key: Hashable, now: float, limit: int, cost: int = 1) -> bool:
+        self._evict_idle(now)
+        window = int(now // self.window)
+
+        state = self._clients.get(key)
+        if state is None:
+            state = self._clients[key] = _ClientWindow(window, now)
+            if len(self._clients) > self.max_clients:
+                self._clients.popitem(last=False)
+                self.capacity_evictions += 1
+        else:
+            self._clients.move_to_end(key)
+            state.last_seen = now
+            if state.window != window:
+                self._roll(state, window)
+
+        if self._estimate(state, now) + cost - 1 >= limit:
+            self.rejected += 1
+            return False
+        state.current += cost
+        self.allowed += 1
+        if self.store is not None:
+            state.pending += cost
+            self._dirty[key] = state
+        return True
+
+    def flush(self, blocking: bool = True):
+        """Add pending counts to the shared store and pick up the other workers' totals.
+
+        With ``blocking=False`` this returns at once if another thread is
+        flushing. Store errors are logged and counted; the counts are retried
+        on the next flush.
+        """
+        if self.store is None or not self._flush_lock.acquire(blocking=blocking):
+            return
+        try:
+            self._last_flush = self.clock()
+            window = int(self._last_flush // self.window)
+            with self._lock:
+                dirty, self._dirty = self._dirty, {}
+                pending = {}
+                for key, state in dirty.items():
+                    if state.window != window:
+                        self._roll(state, window)
+                    elif state.pending:
+                        pending[key] = state.pending
+                        state.pending = 0
+            if not pending:
+                return
+            try:
+                totals = self.store.add(pending, window)
+            except sqlite3.Error as e:
+                logger.warning(f"Rate limit flush failed ({len(pending)} clients): {str(e)}")
+                with self._lock:
+                    for key, count in pending.items():
+                        state = dirty[key]
+                        if state.window == window:
+                            state.pending += count
+                            self._dirty[key] = state
+                self.flush_errors += 1
+                return
+            with self._lock:
+                for key, (previous, current) in totals.items():
+                    state = dirty[key]
+                    if state.window == window:
+                        state.previous = previous
+                        state.current = current + state.pending
+                    elif state.window == window + 1:
+                        state.previous = current
+            self.flushes += 1
+        finally:
+            self._flush_lock.release()
+
+    def count(self, key: Hashable) -> float:
+        """Weighted number of requests from ``key`` in the last ``window`` seconds"""
+        state = self._clients.get(key)
+        if state is None:
+            return 0.0
+        now = self.clock()
+        previous, current = self._counts(state, now)
+        return previous * (1 - (now % self.window) / self.window) + current
+
+    def retry_after(self, key: Hashable, limit: Optional[int] = None, cost: int = 1) -> int:
+        """Whole seconds until ``key`` would next be allowed a request of ``cost`` (0 if it is now).
+
+        ``cost`` must not exceed the limit: such a request is never allowed.
+        """
+        # Room for ``cost`` requests under ``limit`` is room for one under ``limit - cost + 1``
+        limit = (self.limit if limit is None else limit) - cost + 1
+        state = self._clients.get(key)
+        if state is None or self.count(key) < limit:
+            return 0
+        now = self.clock()
+        previous, current = self._counts(state, now)
+        if current < limit:
+            # The previous window's share decays enough before this window ends
+            allowed_at = 1 - (limit - current) / previous
+        else:
+            # This window's count becomes the previous one and has to decay
+            allowed_at = 1 + (1 - limit / current)
+        elapsed = (now % self.window) / self.window
+        return max(1, math.ceil(round((allowed_at - elapsed) * self.window, 6)))
+
+    def clear(self):
+        self._clients.clear()
+        self._dirty.clear()
+        self.allowed = self.rejected = self.idle_evictions = self.capacity_evictions = 0
+        self.flushes = self.flush_errors = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "clients": len(self._clients),
+            "max_clients": self.max_clients,
+            "allowed": self.allowed,
+            "rejected": self.rejected,
+            "idle_evictions": self.idle_evictions,
+            "capacity_evictions": self.capacity_evictions,
+            "shared": self.store is not None,
+            "flushes": self.flushes,
+            "flush_errors": self.flush_errors,
+        }
+
+    def _estimate(self, state: _ClientWindow, now: float) -> float:
+        elapsed = (now % self.window) / self.window
+        return state.previous * (1 - elapsed) + state.current
+
+    def _roll(self, state: _ClientWindow, window: int):
+        """Move ``state`` forward to fixed window ``window``"""
+        state.previous = state.current if state.window == window - 1 else 0
+        state.current = 0
+        state.pending = 0  # Unflushed counts of a finished window are dropped (at most one flush interval)
+        state.window = window
+
+    def _counts(self, state: _ClientWindow, now: float) -> Tuple[int, int]:
+        """(previous, current) window counts as of ``now``, without updating ``state``"""
+        window = int(now // self.window)
+        if state.window == window:
+            return state.previous, state.current
+        if state.window == window - 1:
+            return state.current, 0
+        return 0, 0
+
+    def _evict_idle(self, now: float):
+        # Amortized O(1): every client is evicted at most once per time it was added
+        cutoff = now - 2 * self.window
+        clients = self._clients
+        while clients:
+            key, state = next(iter(clients.items()))
+            if state.last_seen > cutoff:
+                break
+            del clients[key]
+            self.idle_evictions += 1
+
+
+class SQLiteCounterStore:
+    """Fixed-window request counters shared by every worker via a SQLite file.
+
+    ``add`` applies a whole batch of increments in one transaction, so
+    concurrent workers never lose each other's counts.
+    """
+
+    # Keys per SELECT ... IN (...), below SQLite's bound-parameter limit
+    CHUNK = 500
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._purged_before = 0
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS rate_counters ("
+                "key TEXT NOT NULL, window INTEGER NOT NULL, count INTEGER NOT NULL, "
+                "PRIMARY KEY (key, window))"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        return thread_connection(self._local, self.path)
+
+    def add(self, deltas: Dict[str, int], window: int) -> Dict[str, Tuple[int, int]]:
+        """Add ``deltas`` to the counters of ``window``.
+
+        Returns the ``(previous window, window)`` totals for each key, as of
+        this transaction.
+        """
+        conn = self._connect()
+        totals = {key: [0, 0] for key in deltas}
+        with conn:
+            conn.executemany(
+                "INSERT INTO rate_counters (key, window, count) VALUES (?, ?, ?) "
+                "ON CONFLICT (key, window) DO UPDATE SET count = count + excluded.count",
+                ((key, window, count) for key, count in deltas.items()),
+            )
+            for chunk in _chunks(list(deltas), self.CHUNK):
+                rows = conn.execute(
+                    f"SELECT key, window, count FROM rate_counters "
+                    f"WHERE window >= ? AND key IN ({','.join('?' * len(chunk))})",
+                    (window - 1, *chunk),
+                )
+                for key, row_window, count in rows:
+                    if row_window <= window:
+                        totals[key][row_window - window + 1] = count
+            if window - 1 > self._purged_before:
+                conn.execute("DELETE FROM rate_counters WHERE window < ?", (window - 1,))
+                self._purged_before = window - 1
+        return {key: (previous, current) for key, (previous, current) in totals.items()}
+
+    def __len__(self) -> int:
+        return self._connect().execute("SELECT COUNT(*) FROM rate_counters").fetchone()[0]
+
+
+def _chunks(items: list, size: int) -> Iterable[list]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
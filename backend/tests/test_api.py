@@ -3,17 +3,52 @@ Comprehensive test suite for Grokipedia API backend
 Tests all endpoints, rate limiting, caching, and error handling
 """
 import pytest
+import asyncio
+import httpx
+import json
 from fastapi.testclient import TestClient
-from unittest.mock import patch, MagicMock
-from datetime import datetime, timedelta
+from unittest.mock import patch, AsyncMock
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta, timezone
+import os
 import sys
+import threading
+import time
+import zlib
 from pathlib import Path
 
 # Add parent directory to path to import main
 sys.path.insert(0, str(Path(__file__).parent.parent))
-from main import app, _cache, normalize_slug, extract_references, CACHE_TTL
+import main
+from cache import SQLiteStore
+from main import app, _cache, normalize_slug, extract_references, parse_article, render_page, find_content_div, CACHE_TTL, CACHE_STALE_TTL, CACHE_REFRESH_AHEAD
 
-client = TestClient(app)
+# Endpoints refuse to serve until their secrets are configured
+os.environ.setdefault("API_SECRET_KEY", "test-api-key")
+os.environ.setdefault("HEALTH_SECRET", "test-secret")
+
+client = TestClient(app, headers={"X-API-Key": os.environ["API_SECRET_KEY"]})
+
+
+@pytest.fixture(autouse=True)
+def reset_rate_limiter():
+    """Every test client request comes from one IP; don't let the suite trip the limit"""
+    main.rate_limiter.clear()
+
+
+def make_response(status_code, text="", headers=None):
+    """Upstream response as returned by main.fetch_upstream"""
+    return httpx.Response(status_code, text=text, headers=headers, request=httpx.Request("GET", "https://grokipedia.com/page/Test"))
+
+
+async def request_and_wait(path):
+    """GET ``path`` on the app's event loop, then let background refreshes finish"""
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test", headers=client.headers) as ac:
+        response = await ac.get(path)
+        while main._inflight:
+            await asyncio.sleep(0.01)
+        return response
 
 
 class TestRootEndpoint:
@@ -50,9 +85,89 @@ class TestHealthEndpoint:
             assert data["status"] == "Live"
             assert "cached_items" in data
             assert "cache_size_mb" in data
-            assert "cached_slugs" in data
+            assert "cached_slugs" not in data  # Opt-in: listing sorts the whole cache
             assert "timestamp" in data
 
+    def test_health_lists_slugs_in_pages(self):
+        """Cached slugs are listed alphabetically, a page at a time, on request"""
+        _cache.clear()
+        for slug in ["Gamma", "Alpha", "Delta", "Beta"]:
+            _cache.set(slug, "article", size=1)
+        first = client.get("/health?key=test-secret&include_slugs=true&slugs_limit=3").json()
+        assert first["cached_slugs"] == ["Alpha", "Beta", "Delta"]
+        assert first["cached_slugs_next_offset"] == 3
+        second = client.get("/health?key=test-secret&include_slugs=true&slugs_limit=3&slugs_offset=3").json()
+        assert second["cached_slugs"] == ["Gamma"]
+        assert second["cached_slugs_next_offset"] is None
+        _cache.clear()
+
+
+class TestMetricsEndpoint:
+    """The /metrics endpoint exposes Prometheus metrics"""
+
+    def test_metrics_requires_key(self):
+        assert client.get("/metrics").status_code == 422
+        assert client.get("/metrics?key=wrong-key").status_code == 401
+
+    @patch('main.fetch_upstream', new_callable=AsyncMock)
+    def test_metrics_cover_request_stages(self, mock_get):
+        _cache.clear()
+        mock_get.return_value = make_response(200, "<article class='prose'><h1>Measured</h1></article>")
+        client.get("/page/Measured")
+        client.get("/page/Measured")
+
+        response = client.get("/metrics?key=test-secret")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        body = response.text
+        assert "grokipedia_cache_hits_total 1" in body
+        assert "grokipedia_cache_misses_total 1" in body
+        assert 'grokipedia_parse_duration_seconds_count{engine="bs4"}' in body
+        assert "grokipedia_render_duration_seconds_count" in body
+        assert 'route="/page/{slug:path}",status="200"' in body
+
+    def test_upstream_fetch_latency_by_status(self):
+        response = make_response(404)
+        with patch.object(main.get_http_client(), "get", new_callable=AsyncMock, return_value=response):
+            before = main.UPSTREAM_FETCH_DURATION.count(status="404")
+            asyncio.run(main.fetch_upstream("https://grokipedia.com/page/Nope"))
+        assert main.UPSTREAM_FETCH_DURATION.count(status="404") == before + 1
+
+
+class TestServerTiming:
+    """Responses carry a per-stage Server-Timing breakdown; profiling is opt-in"""
+
+    def setup_method(self):
+        _cache.clear()
+
+    @staticmethod
+    def stages(response):
+        return [part.split(";")[0] for part in response.headers["Server-Timing"].split(", ")]
+
+    @patch('main.fetch_upstream', new_callable=AsyncMock)
+    def test_stages_for_miss_and_hit(self, mock_get):
+        mock_get.return_value = make_response(200, "<article class='prose'><h1>Timed</h1></article>")
+        miss = client.get("/page/Timed")
+        assert self.stages(miss) == ["cache", "shared", "fetch", "parse", "build", "store", "render", "total"]
+        hit = client.get("/page/Timed")
+        assert self.stages(hit) == ["cache", "render", "total"]
+
+    @patch('main.fetch_upstream', new_callable=AsyncMock)
+    def test_profile_requires_secret(self, mock_get):
+        mock_get.return_value = make_response(200, "<article class='prose'><h1>Profiled</h1></article>")
+        with patch.dict('os.environ', {'PROFILE_SECRET': 'profile-secret'}):
+            ignored = client.get("/page/Profiled", headers={"X-Profile-Key": "wrong"})
+            assert ignored.json()["title"] == "Profiled"
+
+            profiled = client.get("/page/Profiled", headers={"X-Profile-Key": "profile-secret"})
+            assert profiled.status_code == 200
+            assert profiled.headers["content-type"].startswith("text/plain")
+            assert "Response status: 200" in profiled.text
+            assert "function calls" in profiled.text
+
+        # Disabled unless PROFILE_SECRET is configured
+        assert client.get("/page/Profiled", headers={"X-Profile-Key": ""}).json()["title"] == "Profiled"
+
 
 class TestNormalizeSlug:
     """Test slug normalization function"""
@@ -83,7 +198,7 @@ class TestPageEndpoint:
         """Clear cache before each test"""
         _cache.clear()
 
-    @patch('main.requests.get')
+    @patch('main.fetch_upstream', new_callable=AsyncMock)
     def test_fetches_valid_page(self, mock_get):
         """Should fetch and parse a valid Grokipedia page"""
         mock_html = """
@@ -102,9 +217,7 @@ class TestPageEndpoint:
             </body>
         </html>
         """
-        mock_response = MagicMock()
-        mock_response.status_code = 200
-        mock_response.text = mock_html
+        mock_response = make_response(200, mock_html)
         mock_get.return_value = mock_response
 
         response = client.get("/page/Test_Topic")
@@ -121,18 +234,17 @@ class TestPageEndpoint:
         assert len(data["references"]) == 2
         assert data["references"][0]["url"] == "https://example.com/ref1"
 
-    @patch('main.requests.get')
+    @patch('main.fetch_upstream', new_callable=AsyncMock)
     def test_returns_404_for_missing_page(self, mock_get):
         """Should return 404 for non-existent pages"""
-        mock_response = MagicMock()
-        mock_response.status_code = 404
+        mock_response = make_response(404)
         mock_get.return_value = mock_response
 
         response = client.get("/page/Nonexistent_Page")
         assert response.status_code == 404
         assert "Not found" in response.json()["detail"]
 
-    @patch('main.requests.get')
+    @patch('main.fetch_upstream', new_callable=AsyncMock)
     def test_caching_works(self, mock_get):
         """Should cache pages and return from cache on second request"""
         mock_html = """
@@ -145,9 +257,7 @@ class TestPageEndpoint:
             </body>
         </html>
         """
-        mock_response = MagicMock()
-        mock_response.status_code = 200
-        mock_response.text = mock_html
+        mock_response = make_response(200, mock_html)
         mock_get.return_value = mock_response
 
         # First request - should fetch
@@ -161,7 +271,140 @@ class TestPageEndpoint:
         assert mock_get.call_count == 1  # Should not increase
         assert response1.json() == response2.json()
 
-    @patch('main.requests.get')
+    @patch('main.fetch_upstream', new_callable=AsyncMock)
+    def test_hits_reuse_encoded_response(self, mock_get):
+        """Each view is rendered once; later hits return the stored JSON bytes"""
+        mock_get.return_value = make_response(200, "<article class='prose'><h1>Encoded</h1><p>Body text.</p></article>")
+        with patch('main.render_page', wraps=main.render_page) as render:
+            first = client.get("/page/Encoded")
+            second = client.get("/page/Encoded")
+            truncated = client.get("/page/Encoded?truncate=4")
+        assert second.content == first.content
+        assert second.headers["content-type"] == "application/json"
+        assert truncated.json()["char_count"] == 4
+        assert render.call_count == 2  # One per view
+
+    @patch('main.fetch_upstream', new_callable=AsyncMock)
+    def test_views_rendered_off_event_loop(self, mock_get):
+        mock_get.return_value = make_response(200, "<article class='prose'><h1>Threaded</h1></article>")
+        threads = []
+
+        def compress_variants(body):
+            threads.append(threading.get_ident())
+            return {}
+        with patch('main.compress_variants', compress_variants):
+            response = asyncio.run(request_and_wait("/page/Threaded"))  # Event loop on this thread
+        assert response.status_code == 200
+        assert threads and threading.get_ident() not in threads
+
+    @patch('main.fetch_upstream', new_callable=AsyncMock)
+    def test_cache_headers_and_not_modified(self, mock_get):
+        """Pages carry an ETag and a max-age of their remaining TTL; a matching If-None-Match gets a 304"""
+        mock_get.return_value = make_response(200, "<article class='prose'><h1>Validated</h1></article>")
+        first = client.get("/page/Validated")
+        etag = first.headers["etag"]
+        assert first.headers["age"] == "0"
+        assert f"max-age={int(CACHE_TTL.total_seconds())}" in first.headers["cache-control"]
+
+        later = time.time() + 3600
+        with patch.object(_cache, "clock", lambda: later):
+            not_modified = client.get("/page/Validated", headers={"If-None-Match": f'"other", W/{etag}'})
+        assert not_modified.status_code == 304
+        assert not_modified.content == b""
+        assert not_modified.headers["etag"] == etag
+        assert int(not_modified.headers["age"]) >= 3599
+        assert f"max-age={int(CACHE_TTL.total_seconds()) - int(not_modified.headers['age'])}" in not_modified.headers["cache-control"]
+
+        # Each view has its own validator
+        truncated = client.get("/page/Validated?truncate=3", headers={"If-None-Match": etag})
+        assert truncated.status_code == 200
+        assert truncated.headers["etag"] != etag
+
+    @patch('main.fetch_upstream', new_callable=AsyncMock)
+    def test_large_pages_served_precompressed(self, mock_get):
+        """Compressed variants are made once per view and chosen by Accept-Encoding"""
+        paragraphs = "".join(f"<p>Paragraph {i} about rivers and trade.</p>" for i in range(200))
+        mock_get.return_value = make_response(200, f"<article class='prose'><h1>Large</h1>{paragraphs}</article>")
+        plain = client.get("/page/Large", headers={"Accept-Encoding": "identity"})
+        assert "content-encoding" not in plain.headers
+        assert plain.headers["vary"] == "Accept-Encoding"
+
+        with patch('main.compress', wraps=main.compress) as compress:
+            gzipped = client.get("/page/Large", headers={"Accept-Encoding": "gzip"})
+        assert compress.call_count == 0  # Compressed when first rendered
+        assert gzipped.headers["content-encoding"] == "gzip"
+        assert int(gzipped.headers["content-length"]) < len(plain.content)
+        assert gzipped.content == plain.content  # Decoded by the client
+        assert gzipped.headers["etag"] != plain.headers["etag"]
+        assert client.get("/page/Large", headers={"Accept-Encoding": "gzip", "If-None-Match": gzipped.headers["etag"]}).status_code == 304
+
+    @patch('main.fetch_upstream', new_callable=AsyncMock)
+    def test_small_pages_not_compressed(self, mock_get):
+        mock_get.return_value = make_response(200, "<article class='prose'><h1>Tiny</h1></article>")
+        response = client.get("/page/Tiny", headers={"Accept-Encoding": "gzip"})
+        assert "content-encoding" not in response.headers
+
+    @patch('main.fetch_upstream', new_callable=AsyncMock)
+    def test_sitemap_compressed(self, mock_get):
+        """Proxied sitemap XML is compressed on the fly"""
+        urls = "".join(f"<url><loc>https://grokipedia.com/page/Topic_{i}</loc></url>" for i in range(100))
+        xml = f"<?xml version='1.0'?><urlset>{urls}</urlset>"
+        mock_get.return_value = make_response(200, xml)
+        response = client.get("/sitemap?url=https://assets.grokipedia.com/sitemap/sitemap-00001.xml",
+                              headers={"Accept-Encoding": "gzip"})
+        assert response.status_code == 200
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.headers["content-type"] == "application/xml"
+        assert response.text == xml
+
+    @patch('main.fetch_upstream', new_callable=AsyncMock)
+    def test_refreshed_article_is_re_rendered(self, mock_get):
+        """Encoded responses of a replaced article are not served"""
+        mock_get.return_value = make_response(200, "<article class='prose'><h1>Before</h1></article>")
+        assert client.get("/page/Changing").json()["title"] == "Before"
+        mock_get.return_value = make_response(200, "<article class='prose'><h1>After</h1></article>")
+        expired_now = time.time() + (CACHE_TTL + CACHE_STALE_TTL).total_seconds() + 60
+        with patch.object(_cache, "clock", lambda: expired_now):
+            assert client.get("/page/Changing").json()["title"] == "After"
+
+    @patch('main.fetch_upstream', new_callable=AsyncMock)
+    def test_concurrent_misses_share_one_fetch(self, mock_get):
+        """Concurrent misses for the same slug should trigger a single upstream fetch"""
+        mock_response = make_response(200, "<html><body><article class='prose'><h1>Trending</h1></article></body></html>")
+
+        async def slow_fetch(url, headers=None):
+            await asyncio.sleep(0.05)
+            return mock_response
+        mock_get.side_effect = slow_fetch
+
+        async def fetch_concurrently():
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test", headers=client.headers) as ac:
+                return await asyncio.gather(*[ac.get("/page/Trending") for _ in range(10)])
+
+        responses = asyncio.run(fetch_concurrently())
+        assert all(r.status_code == 200 for r in responses)
+        assert mock_get.call_count == 1
+        assert len({r.text for r in responses}) == 1
+
+    @patch('main.fetch_upstream', new_callable=AsyncMock)
+    def test_concurrent_misses_share_errors(self, mock_get):
+        """Waiters on a failed in-flight fetch should receive the same error"""
+        async def failing_fetch(url, headers=None):
+            await asyncio.sleep(0.05)
+            raise httpx.ConnectError("Network error")
+        mock_get.side_effect = failing_fetch
+
+        async def fetch_concurrently():
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test", headers=client.headers) as ac:
+                return await asyncio.gather(*[ac.get("/page/Flaky") for _ in range(5)])
+
+        responses = asyncio.run(fetch_concurrently())
+        assert all(r.status_code == 502 for r in responses)
+        assert mock_get.call_count == 1
+
+    @patch('main.fetch_upstream', new_callable=AsyncMock)
     def test_cache_expiry(self, mock_get):
         """Should refresh cache after TTL expires"""
         mock_html = """
@@ -174,28 +417,133 @@ class TestPageEndpoint:
             </body>
         </html>
         """
-        mock_response = MagicMock()
-        mock_response.status_code = 200
-        mock_response.text = mock_html
+        mock_response = make_response(200, mock_html)
         mock_get.return_value = mock_response
 
         # First request
         response1 = client.get("/page/Expiring_Topic")
         assert response1.status_code == 200
 
-        # Manually expire cache entry
-        cache_key = "Expiring_Topic:True:full:False"
-        if cache_key in _cache:
-            page, _ = _cache[cache_key]
-            expired_time = datetime.now() - CACHE_TTL - timedelta(minutes=1)
-            _cache[cache_key] = (page, expired_time)
-
-        # Second request - should refresh
-        response2 = client.get("/page/Expiring_Topic")
+        # Move the cache clock past the TTL and the stale-while-revalidate window
+        expired_now = time.time() + (CACHE_TTL + CACHE_STALE_TTL).total_seconds() + 60
+        with patch.object(_cache, "clock", lambda: expired_now):
+            # Second request - should refresh
+            response2 = client.get("/page/Expiring_Topic")
         assert response2.status_code == 200
         assert mock_get.call_count == 2  # Should fetch again
 
-    @patch('main.requests.get')
+    @patch('main.fetch_upstream', new_callable=AsyncMock)
+    def test_stale_page_served_while_revalidating(self, mock_get):
+        """An expired page within the stale window is served at once and refreshed in the background"""
+        mock_get.return_value = make_response(200, "<article class='prose'><h1>Old</h1></article>")
+        assert client.get("/page/Stale_Topic").json()["title"] == "Old"
+        mock_get.return_value = make_response(200, "<article class='prose'><h1>New</h1></article>")
+
+        stale_now = time.time() + CACHE_TTL.total_seconds() + 60
+        with patch.object(_cache, "clock", lambda: stale_now):
+            response = asyncio.run(request_and_wait("/page/Stale_Topic"))
+        assert response.json()["title"] == "Old"
+        assert mock_get.call_count == 2
+
+        # The background refresh replaced the cached copy
+        assert client.get("/page/Stale_Topic").json()["title"] == "New"
+        assert mock_get.call_count == 2
+
+    @patch('main.fetch_upstream', new_callable=AsyncMock)
+    def test_refresh_ahead_before_expiry(self, mock_get):
+        """A page inside the refresh-ahead window is refreshed before it expires"""
+        mock_get.return_value = make_response(200, "<article class='prose'><h1>Hot</h1></article>")
+        client.get("/page/Hot_Topic")
+
+        almost_expired = time.time() + (CACHE_TTL - CACHE_REFRESH_AHEAD).total_seconds() + 60
+        with patch.object(_cache, "clock", lambda: almost_expired):
+            assert asyncio.run(request_and_wait("/page/Hot_Topic")).status_code == 200
+            assert mock_get.call_count == 2
+            # Refreshed copy is fresh again, so no further refresh is scheduled
+            assert _cache.age(_cache.get_entry("Hot_Topic")) == 0
+
+    @patch('main.fetch_upstream', new_callable=AsyncMock)
+    def test_failed_refresh_keeps_stale_copy(self, mock_get):
+        """A failing background refresh leaves the stale page in place"""
+        mock_get.return_value = make_response(200, "<article class='prose'><h1>Kept</h1></article>")
+        client.get("/page/Kept_Topic")
+        mock_get.return_value = make_response(500)
+
+        stale_now = time.time() + CACHE_TTL.total_seconds() + 60
+        with patch.object(_cache, "clock", lambda: stale_now):
+            assert asyncio.run(request_and_wait("/page/Kept_Topic")).json()["title"] == "Kept"
+            assert asyncio.run(request_and_wait("/page/Kept_Topic")).json()["title"] == "Kept"
+        assert "Kept_Topic" in _cache
+
+    @patch('main.fetch_upstream', new_callable=AsyncMock)
+    def test_failed_refresh_backs_off(self, mock_get):
+        """After a failed refresh the page isn't refreshed again until the retry interval has passed"""
+        mock_get.return_value = make_response(200, "<article class='prose'><h1>Flaky</h1></article>")
+        client.get("/page/Flaky_Topic")
+        mock_get.side_effect = httpx.ConnectError("Upstream down")
+
+        now = time.time() + CACHE_TTL.total_seconds() + 60
+        with patch.object(_cache, "clock", lambda: now):
+            for _ in range(3):
+                assert asyncio.run(request_and_wait("/page/Flaky_Topic")).status_code == 200
+        assert mock_get.call_count == 2  # The first stale read refreshed; the next two backed off
+
+        now += main.CACHE_REFRESH_RETRY.total_seconds()
+        with patch.object(_cache, "clock", lambda: now):
+            asyncio.run(request_and_wait("/page/Flaky_Topic"))
+        assert mock_get.call_count == 3
+
+    @patch('main.fetch_upstream', new_callable=AsyncMock)
+    def test_refresh_revalidates_with_validators(self, mock_get):
+        """A refresh sends the stored ETag/Last-Modified and a 304 keeps the page without re-parsing"""
+        validators = {"ETag": '"v1"', "Last-Modified": "Wed, 01 Jan 2025 00:00:00 GMT"}
+        mock_get.return_value = make_response(200, "<article class='prose'><h1>Same</h1></article>", validators)
+        client.get("/page/Validated_Topic")
+        mock_get.return_value = make_response(304)
+
+        stale_now = time.time() + CACHE_TTL.total_seconds() + 60
+        with patch.object(_cache, "clock", lambda: stale_now), \
+                patch.object(main.parse_pool, "parse", new_callable=AsyncMock) as mock_parse:
+            assert asyncio.run(request_and_wait("/page/Validated_Topic")).json()["title"] == "Same"
+            assert mock_parse.call_count == 0
+            # TTL restarted on the unchanged copy
+            assert _cache.age(_cache.get_entry("Validated_Topic")) == 0
+        assert mock_get.call_args.kwargs["headers"] == {
+            "If-None-Match": '"v1"',
+            "If-Modified-Since": "Wed, 01 Jan 2025 00:00:00 GMT",
+        }
+
+    @patch('main.sitemap_unchanged_since', new_callable=AsyncMock, return_value=True)
+    @patch('main.fetch_upstream', new_callable=AsyncMock)
+    def test_refresh_skipped_when_sitemap_unchanged(self, mock_get, mock_sitemap):
+        """An unchanged sitemap lastmod extends the TTL without contacting Grokipedia"""
+        mock_get.return_value = make_response(200, "<article class='prose'><h1>Quiet</h1></article>")
+        client.get("/page/Quiet_Topic")
+
+        stale_now = time.time() + CACHE_TTL.total_seconds() + 60
+        with patch.object(_cache, "clock", lambda: stale_now):
+            assert asyncio.run(request_and_wait("/page/Quiet_Topic")).json()["title"] == "Quiet"
+            assert _cache.age(_cache.get_entry("Quiet_Topic")) == 0
+        assert mock_get.call_count == 1
+        assert mock_sitemap.call_count == 1
+
+    def test_sitemap_lastmod_comparison(self):
+        """Only a sync newer than the fetch, with a lastmod older than it, counts as unchanged"""
+        fetched_at = datetime(2025, 1, 10, tzinfo=timezone.utc).timestamp()
+
+        def lookup(row):
+            response = httpx.Response(200, json=[row], request=httpx.Request("GET", "https://supabase.test"))
+            with patch.object(main, "SUPABASE_URL", "https://supabase.test"), \
+                    patch.object(main, "SUPABASE_KEY", "anon"), \
+                    patch.object(main.get_http_client(), "get", new_callable=AsyncMock, return_value=response):
+                return asyncio.run(main.sitemap_unchanged_since("Topic", fetched_at))
+
+        assert lookup({"last_modified": "2025-01-05", "updated_at": "2025-01-12T00:00:00+00:00"})
+        assert not lookup({"last_modified": "2025-01-11", "updated_at": "2025-01-12T00:00:00+00:00"})
+        assert not lookup({"last_modified": "2025-01-05", "updated_at": "2025-01-09T00:00:00+00:00"})
+        assert not lookup({"last_modified": None, "updated_at": "2025-01-12T00:00:00+00:00"})
+
+    @patch('main.fetch_upstream', new_callable=AsyncMock)
     def test_truncate_parameter(self, mock_get):
         """Should truncate content when truncate parameter is provided"""
         long_content = "A" * 1000
@@ -209,9 +557,7 @@ class TestPageEndpoint:
             </body>
         </html>
         """
-        mock_response = MagicMock()
-        mock_response.status_code = 200
-        mock_response.text = mock_html
+        mock_response = make_response(200, mock_html)
         mock_get.return_value = mock_response
 
         response = client.get("/page/Long_Topic?truncate=100")
@@ -219,7 +565,7 @@ class TestPageEndpoint:
         data = response.json()
         assert len(data["content_text"]) <= 100
 
-    @patch('main.requests.get')
+    @patch('main.fetch_upstream', new_callable=AsyncMock)
     def test_extract_refs_parameter(self, mock_get):
         """Should skip reference extraction when extract_refs=false"""
         mock_html = """
@@ -235,9 +581,7 @@ class TestPageEndpoint:
             </body>
         </html>
         """
-        mock_response = MagicMock()
-        mock_response.status_code = 200
-        mock_response.text = mock_html
+        mock_response = make_response(200, mock_html)
         mock_get.return_value = mock_response
 
         response = client.get("/page/Topic?extract_refs=false")
@@ -247,31 +591,468 @@ class TestPageEndpoint:
         assert len(data["references"]) == 0
 
 
+class TestArticleViews:
+    """Variants rendered from one cached Article must match a direct parse"""
+
+    def setup_method(self):
+        """Clear cache before each test"""
+        _cache.clear()
+
+    HTML_CASES = [
+        "<article class='prose'><h1>Title<sup>[1]</sup></h1><p>Intro<sup><a href='#c1'>[1]</a></sup> text.</p><p>More<sup>[2]</sup></p></article>",
+        "<article class='prose'><p><sup>[1]</sup>Starts with a citation</p><p>Ends with one<sup>[3]</sup></p></article>",
+        "<article class='prose'><p>Empty<sup></sup> and blank<sup>  </sup> citations</p></article>",
+        "<article class='prose'><p>Nested<sup>[1<sup>a</sup>]</sup> citation</p></article>",
+        "<article class='prose'><p>Multi<sup><a>1</a>,<a>2</a></sup> link citation</p><pre>keep\n\n\n\nspacing</pre></article>",
+        "<article class='prose'><p><sup>[1]</sup></p><p><sup>[2]</sup></p></article>",
+        "<p>No article wrapper<sup>[9]</sup></p>",
+        "",
+    ]
+
+    @staticmethod
+    def legacy_parse(html, truncate, citations):
+        """The per-variant parse get_page performed before articles were cached once"""
+        from bs4 import BeautifulSoup
+        import re
+
+        soup = BeautifulSoup(html, "html.parser")
+        unwanted_tags = ["script", "style", "nav", "header", "footer", "aside"]
+        if not citations:
+            unwanted_tags.append("sup")
+        for tag in soup(unwanted_tags):
+            tag.decompose()
+        content_div = find_content_div(soup)
+        h1 = content_div.find("h1")
+        title = h1.get_text(strip=True) if h1 else "Slug"
+        content_text = re.sub(r'\n{3,}', '\n\n', content_div.get_text(separator="\n\n", strip=True))
+        if truncate:
+            content_text = content_text[:truncate]
+        return title, content_text
+
+    @pytest.mark.parametrize("html", HTML_CASES)
+    @pytest.mark.parametrize("citations", [True, False])
+    @pytest.mark.parametrize("truncate", [None, 10])
+    def test_views_match_direct_parse(self, html, citations, truncate):
+        article = parse_article(html, "Slug", "https://grokipedia.com/page/Slug")
+        page = render_page(article, extract_refs=True, truncate=truncate, citations=citations)
+        assert (page.title, page.content_text) == self.legacy_parse(html, truncate, citations)
+        assert page.char_count == len(page.content_text)
+
+    def test_extract_refs_view(self):
+        html = "<article class='prose'><p>Body</p></article><div id='references'><ol><li><a href='https://a.example'>A</a></li></ol></div>"
+        article = parse_article(html, "Slug", "https://grokipedia.com/page/Slug")
+        assert render_page(article, True, None, False).references_count == 1
+        page = render_page(article, False, None, False)
+        assert page.references_count == 0
+        assert page.references == []
+
+    @patch('main.fetch_upstream', new_callable=AsyncMock)
+    def test_variants_share_one_fetch(self, mock_get):
+        """Different query params for the same slug should reuse one cached article"""
+        mock_response = make_response(200, "<article class='prose'><h1>Shared</h1><p>Text<sup>[1]</sup> here.</p></article>")
+        mock_get.return_value = mock_response
+
+        full = client.get("/page/Shared").json()
+        cited = client.get("/page/Shared?citations=true").json()
+        short = client.get("/page/Shared?truncate=5&extract_refs=false").json()
+
+        assert mock_get.call_count == 1
+        assert len(_cache) == 1
+        assert "[1]" not in full["content_text"]
+        assert "[1]" in cited["content_text"]
+        assert short["content_text"] == full["content_text"][:5]
+
+
+class TestSharedCacheTier:
+    """Articles written to the shared tier are reused after the local cache is lost"""
+
+    def setup_method(self):
+        """Clear cache before each test"""
+        _cache.clear()
+
+    @patch('main.fetch_upstream', new_callable=AsyncMock)
+    def test_local_miss_served_from_shared_tier(self, mock_get, tmp_path):
+        mock_response = make_response(200, "<article class='prose'><h1>Shared Tier</h1><p>Body<sup>[1]</sup></p></article>")
+        mock_get.return_value = mock_response
+
+        store = SQLiteStore(str(tmp_path / "pages.db"), ttl=CACHE_TTL.total_seconds())
+        with patch.object(main, "_shared_store", store):
+            first = client.get("/page/Shared_Tier?citations=true").json()
+            assert len(store) == 1
+
+            # Simulate another worker (or a restart) with an empty local cache
+            _cache.clear()
+            second = client.get("/page/Shared_Tier?citations=true").json()
+
+        assert mock_get.call_count == 1
+        assert first == second
+        assert "Shared_Tier" in _cache
+
+    @patch('main.fetch_upstream', new_callable=AsyncMock)
+    def test_serialization_off_event_loop(self, mock_get, tmp_path):
+        mock_get.return_value = make_response(200, "<article class='prose'><h1>Off Loop</h1></article>")
+        threads = []
+
+        def record(function):
+            def wrapper(*args):
+                threads.append(threading.get_ident())
+                return function(*args)
+            return wrapper
+
+        store = SQLiteStore(str(tmp_path / "pages.db"), ttl=CACHE_TTL.total_seconds())
+        with patch.object(main, "_shared_store", store), \
+                patch('main.serialize_article', record(main.serialize_article)), \
+                patch('main.deserialize_article', record(main.deserialize_article)):
+            asyncio.run(request_and_wait("/page/Off_Loop"))  # Event loop on this thread
+            _cache.clear()
+            asyncio.run(request_and_wait("/page/Off_Loop"))
+        assert len(threads) == 2
+        assert threading.get_ident() not in threads
+
+
+class TestCompactArticle:
+    """Cached articles are stored packed and expanded only when rendered"""
+
+    TEXT = "Intro \ue000[1]\ue001 text. " * 100
+
+    def test_references_unpacked_in_order(self):
+        urls = ["https://a.example/1", "", "https://b.example/ü"]
+        article = main.Article(title="T", slug="T", url="u", content_text="", reference_urls=urls)
+        assert article.reference_urls == urls
+        assert [(ref.number, ref.url) for ref in article.references] == [(1, urls[0]), (2, ""), (3, urls[2])]
+        assert article.references_count == 3
+
+    def test_references_from_iterator(self):
+        urls = ["https://a.example/1", "https://b.example/2"]
+        article = main.Article(title="T", slug="T", url="u", content_text="", reference_urls=iter(urls))
+        assert article.reference_urls == urls
+
+    def test_compression_threshold(self):
+        with patch.object(main, "CACHE_COMPRESS_TEXT", True), \
+                patch.object(main, "CACHE_COMPRESS_TEXT_MIN_BYTES", len(self.TEXT.encode()) + 1):
+            short = main.Article(title="T", slug="T", url="u", content_text=self.TEXT)
+        assert not short._compressed
+        assert short.content_text == self.TEXT
+
+    def test_compressed_text_round_trip(self):
+        with patch.object(main, "CACHE_COMPRESS_TEXT", True):
+            compressed = main.Article(title="T", slug="T", url="u", content_text=self.TEXT)
+        plain = main.Article(title="T", slug="T", url="u", content_text=self.TEXT)
+        assert compressed.content_text == plain.content_text == self.TEXT
+        assert compressed.nbytes() < plain.nbytes() < len(self.TEXT) * 2
+
+    def test_serialization_round_trip_and_legacy_blobs(self):
+        article = main.Article(title="T", slug="T", url="u", content_text=self.TEXT,
+                               reference_urls=["https://a.example"], etag='"v1"')
+        restored = main.deserialize_article(main.serialize_article(article))
+        assert restored.to_dict() == article.to_dict()
+
+        legacy = {"title": "T", "slug": "T", "url": "u", "content_text": "x",
+                  "references": [{"number": 1, "url": "https://a.example"}], "etag": None, "last_modified": None}
+        restored = main.deserialize_article(zlib.compress(json.dumps(legacy).encode()))
+        assert restored.reference_urls == ["https://a.example"]
+
+
+class TestCacheSnapshot:
+    """The cache is saved on shutdown and reloaded at startup with its timestamps"""
+
+    def setup_method(self):
+        _cache.clear()
+
+    @patch('main.fetch_upstream', new_callable=AsyncMock)
+    def test_snapshot_round_trip(self, mock_get, tmp_path):
+        mock_get.return_value = make_response(200, "<article class='prose'><h1>Kept</h1><p>Text.</p></article>")
+        client.get("/page/Kept_Old")
+        client.get("/page/Kept_New")
+        client.get("/page/Kept_New")
+        old_entry = _cache.peek("Kept_Old")
+        old_entry.stored_at -= 3600
+        _cache.set("Long_Gone", main.Article(title="Expired", slug="Long_Gone", url="", content_text=""),
+                   stored_at=time.time() - (CACHE_TTL + CACHE_STALE_TTL).total_seconds() - 60)
+
+        with patch.object(main, "CACHE_SNAPSHOT_PATH", str(tmp_path / "cache.snapshot")):
+            asyncio.run(main.save_cache_snapshot())
+            stored_at = old_entry.stored_at
+            _cache.clear()
+            asyncio.run(main.load_cache_snapshot())
+
+        assert list(_cache.keys()) == ["Kept_Old", "Kept_New"]  # LRU order kept, expired page dropped
+        assert _cache.peek("Kept_Old").stored_at == stored_at
+        assert _cache.peek("Kept_New").hits == 1
+        assert client.get("/page/Kept_New").json()["title"] == "Kept"
+        assert mock_get.call_count == 2
+
+    def test_missing_or_corrupt_snapshot_starts_cold(self, tmp_path):
+        path = tmp_path / "cache.snapshot"
+        with patch.object(main, "CACHE_SNAPSHOT_PATH", str(path)):
+            asyncio.run(main.load_cache_snapshot())
+            path.write_bytes(b"garbage")
+            asyncio.run(main.load_cache_snapshot())
+        assert len(_cache) == 0
+
+
+class TestWarmUp:
+    """Popular slugs are prefetched into the cache and hit counts saved for the next run"""
+
+    def setup_method(self):
+        _cache.clear()
+
+    @patch('main.fetch_upstream', new_callable=AsyncMock)
+    def test_warm_up_loads_sources_once(self, mock_get, tmp_path):
+        mock_get.return_value = make_response(200, "<article class='prose'><h1>Warm</h1></article>")
+        slug_file = tmp_path / "slugs.txt"
+        _cache.set("Warm_Three", main.Article(title="Cached", slug="Warm_Three", url="", content_text=""))
+        slug_file.write_text("Warm_One\nWarm Two\nWarm_One\nWarm_Three\n")
+
+        with patch.object(main, "WARMUP_SLUGS_FILE", str(slug_file)):
+            stats = asyncio.run(main.warm_up(["file"], limit=10, concurrency=2))
+        assert stats["loaded"] == 3
+        assert mock_get.call_count == 2  # Warm_Three was already cached
+        assert {"Warm_One", "Warm_Two", "Warm_Three"} <= set(_cache.keys())
+        assert _cache.stats()["hits"] == 0
+
+    @patch('main.fetch_upstream', new_callable=AsyncMock)
+    def test_hit_counts_feed_next_warm_up(self, mock_get, tmp_path):
+        mock_get.return_value = make_response(200, "<article class='prose'><h1>Popular</h1></article>")
+        for _ in range(3):
+            client.get("/page/Popular")
+        client.get("/page/Occasional")
+        client.get("/page/Occasional")
+
+        hits_file = str(tmp_path / "hits.json")
+        with patch.object(main, "HIT_COUNTS_FILE", hits_file):
+            asyncio.run(main.save_hit_counts())
+            assert asyncio.run(main.collect_warmup_slugs(["hits"], limit=10)) == ["Popular", "Occasional"]
+
+
+class TestBatchEndpoint:
+    """POST /pages resolves many slugs in one request"""
+
+    def setup_method(self):
+        """Clear cache before each test"""
+        _cache.clear()
+
+    @patch('main.fetch_upstream', new_callable=AsyncMock)
+    def test_mixed_results_keep_request_order(self, mock_get):
+        async def fetch(url, headers=None):
+            if url.endswith("/Missing"):
+                return make_response(404)
+            title = url.rsplit("/", 1)[1]
+            return make_response(200, f"<article class='prose'><h1>{title}</h1><p>Text<sup>[1]</sup></p></article>")
+        mock_get.side_effect = fetch
+        client.get("/page/Cached")
+
+        response = client.post("/pages", json={"slugs": ["Cached", "Missing", "Fresh topic"], "citations": True})
+        assert response.status_code == 200
+        results = response.json()["results"]
+        assert [r["slug"] for r in results] == ["Cached", "Missing", "Fresh topic"]
+        assert [r["status"] for r in results] == [200, 404, 200]
+        assert results[0]["page"] == client.get("/page/Cached?citations=true").json()
+        assert results[1]["page"] is None and "Missing" in results[1]["error"]
+        assert results[2]["page"]["title"] == "Fresh_topic"
+        assert mock_get.call_count == 3
+
+    @patch('main.fetch_upstream', new_callable=AsyncMock)
+    def test_misses_fetched_with_bounded_concurrency(self, mock_get):
+        active = 0
+        peak = 0
+
+        async def slow_fetch(url, headers=None):
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.02)
+            active -= 1
+            return make_response(200, "<article class='prose'><h1>Bulk</h1></article>")
+        mock_get.side_effect = slow_fetch
+
+        async def post_batch():
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test", headers=client.headers) as ac:
+                return await ac.post("/pages", json={"slugs": [f"Bulk_{i}" for i in range(10)]})
+
+        # Entries past the stale window are still in the cache until read, but they are misses too
+        long_expired = time.time() - (CACHE_TTL + CACHE_STALE_TTL).total_seconds() - 60
+        for i in range(5):
+            _cache.set(f"Bulk_{i}", main.Article(title="Old", slug=f"Bulk_{i}", url="", content_text=""),
+                       stored_at=long_expired)
+
+        with patch.object(main, "BATCH_CONCURRENCY", 3):
+            response = asyncio.run(post_batch())
+        assert all(r["status"] == 200 for r in response.json()["results"])
+        assert mock_get.call_count == 10
+        assert 1 < peak <= 3
+
+    def test_rejects_empty_batch(self):
+        assert client.post("/pages", json={"slugs": []}).status_code == 422
+
+    @patch('main.fetch_upstream', new_callable=AsyncMock)
+    def test_stream_emits_in_completion_order(self, mock_get):
+        async def fetch(url, headers=None):
+            title = url.rsplit("/", 1)[1]
+            await asyncio.sleep(0.1 if title == "Slow" else 0.01)
+            return make_response(200, f"<article class='prose'><h1>{title}</h1></article>")
+        mock_get.side_effect = fetch
+
+        response = client.post("/pages/stream", json={"slugs": ["Slow", "Quick", "Nowhere"]})
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/x-ndjson"
+        results = [json.loads(line) for line in response.text.splitlines()]
+        assert [r["slug"] for r in results][-1] == "Slow"
+        assert sorted(r["page"]["title"] for r in results) == ["Nowhere", "Quick", "Slow"]
+
+    @patch('main.fetch_upstream', new_callable=AsyncMock)
+    def test_stream_keeps_bounded_work_in_flight(self, mock_get):
+        active = 0
+        peak = 0
+
+        async def slow_fetch(url, headers=None):
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.01)
+            active -= 1
+            if url.endswith("_7"):
+                return make_response(404)
+            return make_response(200, "<article class='prose'><h1>Bulk</h1></article>")
+        mock_get.side_effect = slow_fetch
+
+        with patch.object(main, "BATCH_CONCURRENCY", 4):
+            response = client.post("/pages/stream", json={"slugs": [f"Stream_{i}" for i in range(20)]})
+        results = [json.loads(line) for line in response.text.splitlines()]
+        assert sorted(r["slug"] for r in results) == sorted(f"Stream_{i}" for i in range(20))
+        assert [r["status"] for r in results].count(404) == 1
+        assert 1 < peak <= 4
+
+
 class TestRateLimiting:
     """Test rate limiting functionality"""
 
     def setup_method(self):
         """Clear rate limit tracking before each test"""
-        from main import request_times
-        request_times.clear()
+        main.rate_limiter.clear()
 
-    @patch('main.requests.get')
+    @patch('main.fetch_upstream', new_callable=AsyncMock)
     def test_rate_limit_enforced(self, mock_get):
         """Should enforce rate limit after max requests"""
         mock_html = "<html><body><article class='prose'><h1>Test</h1></article></body></html>"
-        mock_response = MagicMock()
-        mock_response.status_code = 200
-        mock_response.text = mock_html
+        mock_response = make_response(200, mock_html)
         mock_get.return_value = mock_response
 
-        # Make requests up to the limit (100)
-        # For testing, we'll just test a few requests work
-        for i in range(5):
-            response = client.get(f"/page/Test_{i}")
+        for i in range(main.RATE_LIMIT):
+            response = client.get(f"/page/Test_{i % 5}")
             assert response.status_code == 200
 
-        # Note: Testing actual rate limit would require making 100+ requests
-        # which is slow. The important part is that rate limiting is implemented.
+        response = client.get("/page/Test_0")
+        assert response.status_code == 429
+        assert f"per {main.RATE_WINDOW} seconds" in response.json()["detail"]
+        assert int(response.headers["Retry-After"]) >= 1
+        main.rate_limiter.clear()
+
+    @patch('main.fetch_upstream', new_callable=AsyncMock)
+    def test_batches_charged_per_slug(self, mock_get):
+        mock_get.return_value = make_response(200, "<article class='prose'><h1>Test</h1></article>")
+        slugs = [f"Batch_{i}" for i in range(main.RATE_LIMIT - 10)]
+        assert client.post("/pages", json={"slugs": slugs}).status_code == 200
+
+        # 10 requests left: an 11-slug batch is rejected whole, a 10-slug stream still fits
+        response = client.post("/pages", json={"slugs": slugs[:11]})
+        assert response.status_code == 429
+        assert int(response.headers["Retry-After"]) >= 1
+        assert client.post("/pages/stream", json={"slugs": slugs[:10]}).status_code == 200
+        assert client.get("/page/Batch_0").status_code == 429
+
+    def test_stream_longer_than_limit_rejected(self):
+        slugs = [f"Batch_{i}" for i in range(main.RATE_LIMIT + 1)]
+        response = client.post("/pages/stream", json={"slugs": slugs})
+        assert response.status_code == 429
+        assert f"Batch of {main.RATE_LIMIT + 1} pages" in response.json()["detail"]
+
+
+class TestApiKeys:
+    """Configured API keys get their own rate and concurrency limits"""
+
+    def setup_method(self):
+        _cache.clear()
+
+    @patch('main.fetch_upstream', new_callable=AsyncMock)
+    def test_key_has_own_rate_limit(self, mock_get):
+        mock_get.return_value = make_response(200, "<article class='prose'><h1>Keyed</h1></article>")
+        with patch.object(main, "API_KEYS", {"batch-secret": main.ApiKey("batch", rate_limit=3)}):
+            batch = {"X-API-Key": "batch-secret"}
+            assert all(client.get("/page/Keyed", headers=batch).status_code == 200 for _ in range(3))
+            response = client.get("/page/Keyed", headers=batch)
+            assert response.status_code == 429
+            assert "3 requests" in response.json()["detail"]
+            # The shared frontend key is limited separately
+            assert client.get("/page/Keyed").status_code == 200
+
+    @patch('main.fetch_upstream', new_callable=AsyncMock)
+    def test_concurrency_cap(self, mock_get):
+        async def slow_fetch(url, headers=None):
+            await asyncio.sleep(0.05)
+            return make_response(200, "<article class='prose'><h1>Slow</h1></article>")
+        mock_get.side_effect = slow_fetch
+
+        async def fetch_concurrently():
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test",
+                                         headers={"X-API-Key": "bulk-secret"}) as ac:
+                return await asyncio.gather(*[ac.get(f"/page/Slow_{i}") for i in range(3)])
+
+        with patch.object(main, "API_KEYS", {"bulk-secret": main.ApiKey("bulk", max_concurrency=2)}):
+            responses = asyncio.run(fetch_concurrently())
+        assert sorted(r.status_code for r in responses) == [200, 200, 429]
+        assert main._active_requests["bulk"] == 0
+
+    @patch('main.fetch_upstream', new_callable=AsyncMock)
+    def test_stream_holds_concurrency_slot_until_finished(self, mock_get):
+        async def slow_fetch(url, headers=None):
+            await asyncio.sleep(0.05)
+            return make_response(200, "<article class='prose'><h1>Streamed</h1></article>")
+        mock_get.side_effect = slow_fetch
+        slugs = [f"Streamed_{i}" for i in range(20)]
+        held = []
+
+        async def stream_and_probe():
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test",
+                                         headers={"X-API-Key": "bulk-secret"}) as ac:
+                async def probe():
+                    await asyncio.sleep(0.1)  # Stream still running: 20 slugs take ~3 rounds of 50ms
+                    held.append(main._active_requests["bulk"])
+                    return await ac.get("/page/Streamed_0")
+                return await asyncio.gather(ac.post("/pages/stream", json={"slugs": slugs}), probe())
+
+        with patch.object(main, "API_KEYS", {"bulk-secret": main.ApiKey("bulk", max_concurrency=1)}):
+            stream, second = asyncio.run(stream_and_probe())
+        assert stream.status_code == 200
+        assert len(stream.text.splitlines()) == 20
+        assert held == [1]
+        assert second.status_code == 429
+        assert main._active_requests["bulk"] == 0
+
+    @patch('main.fetch_upstream', new_callable=AsyncMock)
+    def test_forwarded_for_trusted_only_from_proxies(self, mock_get):
+        mock_get.return_value = make_response(200, "<article class='prose'><h1>Proxied</h1></article>")
+        first = {"X-Forwarded-For": "203.0.113.7, testclient"}
+        second = {"X-Forwarded-For": "198.51.100.2"}
+        with patch.object(main, "DEFAULT_API_KEY", main.ApiKey("default", rate_limit=2, per_ip=True)):
+            with patch.object(main, "TRUSTED_PROXIES", {"testclient"}):
+                assert client.get("/page/Proxied", headers=first).status_code == 200
+                assert client.get("/page/Proxied", headers=first).status_code == 200
+                assert client.get("/page/Proxied", headers=first).status_code == 429
+                assert client.get("/page/Proxied", headers=second).status_code == 200
+            # Untrusted peers can't pick their own identity
+            assert client.get("/page/Proxied", headers={"X-Forwarded-For": "192.0.2.1"}).status_code == 200
+            assert client.get("/page/Proxied", headers={"X-Forwarded-For": "192.0.2.2"}).status_code == 200
+            assert client.get("/page/Proxied", headers={"X-Forwarded-For": "192.0.2.3"}).status_code == 429
+
+    def test_failed_auth_attempts_are_limited(self):
+        statuses = [client.get("/page/Test", headers={"X-API-Key": f"guess-{i}"}).status_code
+                    for i in range(main.RATE_LIMIT + 1)]
+        assert statuses[:-1] == [403] * main.RATE_LIMIT
+        assert statuses[-1] == 429
 
 
 class TestReferenceExtraction:
@@ -329,32 +1110,60 @@ class TestReferenceExtraction:
 class TestErrorHandling:
     """Test error handling and edge cases"""
 
-    @patch('main.requests.get')
+    @patch('main.fetch_upstream', new_callable=AsyncMock)
     def test_handles_network_errors(self, mock_get):
         """Should handle network errors gracefully"""
-        mock_get.side_effect = Exception("Network error")
+        mock_get.side_effect = httpx.ConnectError("Network error")
 
         response = client.get("/page/Network_Error_Topic")
-        assert response.status_code == 500
+        assert response.status_code == 502
+
+    @patch('main.fetch_upstream', new_callable=AsyncMock)
+    def test_parse_failure_is_bad_gateway(self, mock_get):
+        """A crashed parse worker fails the request with 502, not an unhandled error"""
+        _cache.clear()
+        mock_get.return_value = make_response(200, "<article class='prose'><h1>Crash</h1></article>")
+        with patch.object(main.parse_pool, "parse", AsyncMock(side_effect=BrokenProcessPool("worker died"))):
+            response = client.get("/page/Parse_Crash")
+            assert response.status_code == 502
+            assert "Parse_Crash" in response.json()["detail"]
+
+            batch = client.post("/pages", json={"slugs": ["Parse_Crash", "Other"]})
+        assert batch.status_code == 200
+        assert [r["status"] for r in batch.json()["results"]] == [502, 502]
+
+    @patch('main.fetch_upstream', new_callable=AsyncMock)
+    def test_unexpected_batch_error_fails_only_its_slug(self, mock_get):
+        _cache.clear()
+        mock_get.return_value = make_response(200, "<article class='prose'><h1>Fine</h1></article>")
+
+        render_page = main.render_page
+
+        def render(article, *args):
+            if article.slug == "Broken":
+                raise ValueError("bad view")
+            return render_page(article, *args)
+        with patch('main.render_page', render):
+            response = client.post("/pages", json={"slugs": ["Broken", "Fine"]})
+        assert response.status_code == 200
+        results = response.json()["results"]
+        assert [r["status"] for r in results] == [500, 200]
+        assert "ValueError" in results[0]["error"]
 
-    @patch('main.requests.get')
+    @patch('main.fetch_upstream', new_callable=AsyncMock)
     def test_handles_malformed_html(self, mock_get):
         """Should handle malformed HTML gracefully"""
-        mock_response = MagicMock()
-        mock_response.status_code = 200
-        mock_response.text = "<html><body>Malformed"  # No closing tags
+        mock_response = make_response(200, "<html><body>Malformed")  # No closing tags
         mock_get.return_value = mock_response
 
         response = client.get("/page/Malformed_HTML")
         # BeautifulSoup is lenient, should still parse
         assert response.status_code == 200
 
-    @patch('main.requests.get')
+    @patch('main.fetch_upstream', new_callable=AsyncMock)
     def test_handles_empty_response(self, mock_get):
         """Should handle empty HTML response"""
-        mock_response = MagicMock()
-        mock_response.status_code = 200
-        mock_response.text = ""
+        mock_response = make_response(200, "")
         mock_get.return_value = mock_response
 
         response = client.get("/page/Empty_Response")
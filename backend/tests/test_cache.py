@@ -0,0 +1,315 @@
+"""
+Tests for the LRU/TTL page cache engine, the shared SQLite tier and snapshots
+"""
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add parent directory to path to import cache
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from cache import LRUCache, SnapshotRecord, SQLiteStore, read_snapshot, write_snapshot
+
+
+class FakeClock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def make_cache(max_bytes=100, ttl=60, clock=None):
+    return LRUCache(max_bytes=max_bytes, ttl=ttl, sizeof=len, clock=clock or FakeClock())
+
+
+class TestByteBudget:
+    """Eviction is driven by accounted bytes, not entry count"""
+
+    def test_fills_exactly_to_budget(self):
+        cache = make_cache(max_bytes=100)
+        assert cache.set("a", "x" * 60)
+        assert cache.set("b", "x" * 40)
+        assert cache.total_bytes == 100
+        assert len(cache) == 2
+        assert cache.evictions == 0
+
+    def test_one_byte_over_evicts_lru(self):
+        cache = make_cache(max_bytes=100)
+        cache.set("a", "x" * 60)
+        cache.set("b", "x" * 40)
+        cache.set("c", "x")
+        assert "a" not in cache
+        assert "b" in cache and "c" in cache
+        assert cache.total_bytes == 41
+        assert cache.evictions == 1
+
+    def test_evicts_as_many_entries_as_needed(self):
+        cache = make_cache(max_bytes=100)
+        for key in "abcde":
+            cache.set(key, "x" * 20)
+        cache.set("big", "x" * 90)
+        assert list(cache.keys()) == ["big"]
+        assert cache.evictions == 5
+        assert cache.total_bytes == 90
+
+    def test_rejects_value_larger_than_budget(self):
+        cache = make_cache(max_bytes=100)
+        cache.set("a", "x" * 10)
+        assert not cache.set("huge", "x" * 101)
+        assert "huge" not in cache
+        assert "a" in cache
+        assert cache.total_bytes == 10
+
+    def test_replacing_key_updates_accounting(self):
+        cache = make_cache(max_bytes=100)
+        cache.set("a", "x" * 70)
+        cache.set("a", "x" * 30)
+        assert len(cache) == 1
+        assert cache.total_bytes == 30
+        assert cache.evictions == 0
+
+    def test_explicit_size_overrides_sizeof(self):
+        cache = make_cache(max_bytes=100)
+        cache.set("a", "tiny", size=100)
+        assert cache.total_bytes == 100
+
+    def test_pop_releases_bytes(self):
+        cache = make_cache(max_bytes=100)
+        cache.set("a", "x" * 50)
+        assert cache.pop("a") == "x" * 50
+        assert cache.pop("a", "gone") == "gone"
+        assert cache.total_bytes == 0
+
+
+class TestLRUOrdering:
+    """Reads refresh recency so hot entries survive eviction"""
+
+    def test_get_marks_entry_recently_used(self):
+        cache = make_cache(max_bytes=30)
+        cache.set("a", "x" * 10)
+        cache.set("b", "x" * 10)
+        cache.set("c", "x" * 10)
+        cache.get("a")
+        cache.set("d", "x" * 10)
+        assert "a" in cache
+        assert "b" not in cache
+
+    def test_set_marks_entry_recently_used(self):
+        cache = make_cache(max_bytes=20)
+        cache.set("a", "x" * 10)
+        cache.set("b", "x" * 10)
+        cache.set("a", "y" * 10)
+        cache.set("c", "x" * 10)
+        assert "a" in cache
+        assert "b" not in cache
+
+
+class TestTTL:
+    """Entries expire once older than the TTL"""
+
+    def test_entry_fresh_at_exact_ttl(self):
+        clock = FakeClock()
+        cache = make_cache(ttl=60, clock=clock)
+        cache.set("a", "value")
+        clock.now += 60
+        assert cache.get("a") == "value"
+
+    def test_entry_expires_after_ttl(self):
+        clock = FakeClock()
+        cache = make_cache(ttl=60, clock=clock)
+        cache.set("a", "value")
+        clock.now += 60.001
+        assert cache.get("a") is None
+        assert "a" not in cache
+        assert cache.total_bytes == 0
+        assert cache.expirations == 1
+
+    def test_stored_at_is_preserved(self):
+        clock = FakeClock()
+        cache = make_cache(ttl=60, clock=clock)
+        cache.set("a", "value", stored_at=clock.now - 59)
+        assert cache.age(cache.get_entry("a")) == 59
+        clock.now += 2
+        assert cache.get("a") is None
+
+
+class TestStaleWhileRevalidate:
+    """Expired entries stay readable for stale_ttl when callers allow it"""
+
+    def test_stale_entry_only_returned_when_allowed(self):
+        clock = FakeClock()
+        cache = LRUCache(max_bytes=100, ttl=60, stale_ttl=30, sizeof=len, clock=clock)
+        cache.set("a", "value")
+        clock.now += 61
+        assert cache.get("a") is None
+        entry = cache.get_entry("a", allow_stale=True)
+        assert entry.value == "value"
+        assert cache.is_stale(entry)
+        assert cache.stale_hits == 1
+
+    def test_stale_entry_dropped_after_grace(self):
+        clock = FakeClock()
+        cache = LRUCache(max_bytes=100, ttl=60, stale_ttl=30, sizeof=len, clock=clock)
+        cache.set("a", "value")
+        clock.now += 90
+        assert cache.get_entry("a", allow_stale=True) is not None
+        clock.now += 0.001
+        assert cache.get_entry("a", allow_stale=True) is None
+        assert "a" not in cache
+        assert cache.expirations == 1
+
+    def test_is_servable_without_side_effects(self):
+        clock = FakeClock()
+        cache = LRUCache(max_bytes=100, ttl=60, stale_ttl=30, sizeof=len, clock=clock)
+        cache.set("a", "value")
+        clock.now += 90
+        assert cache.is_servable("a")
+        clock.now += 0.001
+        assert not cache.is_servable("a")
+        assert not cache.is_servable("missing")
+        assert "a" in cache  # Still only dropped when read
+        assert cache.stats()["misses"] == 0
+
+    def test_touch_restarts_ttl(self):
+        clock = FakeClock()
+        cache = make_cache(ttl=60, clock=clock)
+        cache.set("a", "value")
+        clock.now += 59
+        assert cache.touch("a")
+        clock.now += 59
+        assert cache.get("a") == "value"
+        assert not cache.touch("missing")
+
+
+    def test_peek_leaves_order_and_counters_alone(self):
+        clock = FakeClock()
+        cache = make_cache(max_bytes=10, ttl=60, clock=clock)
+        cache.set("a", "x" * 5)
+        cache.set("b", "x" * 5)
+        clock.now += 61
+        assert cache.peek("a").value == "x" * 5  # Expired entries too
+        assert cache.hits == cache.misses == 0
+        cache.set("c", "x" * 5)
+        assert "a" not in cache and "b" in cache
+
+
+class TestCounters:
+    """Hit/miss/eviction counters"""
+
+    def test_counts_hits_and_misses(self):
+        cache = make_cache()
+        cache.set("a", "value")
+        cache.get("a")
+        cache.get("a")
+        cache.get("missing")
+        stats = cache.stats()
+        assert stats["hits"] == 2
+        assert stats["misses"] == 1
+        assert stats["entries"] == 1
+        assert stats["bytes"] == 5
+        assert stats["max_bytes"] == 100
+
+    def test_counts_hits_per_entry(self):
+        cache = make_cache()
+        cache.set("a", "value")
+        cache.set("b", "value")
+        cache.get("a")
+        cache.get("a")
+        assert {key: entry.hits for key, entry in cache.items()} == {"b": 0, "a": 2}
+        cache.set("a", "newer")
+        assert cache.peek("a").hits == 2
+
+    def test_expired_read_counts_as_miss(self):
+        clock = FakeClock()
+        cache = make_cache(ttl=60, clock=clock)
+        cache.set("a", "value")
+        clock.now += 61
+        cache.get("a")
+        assert cache.misses == 1
+        assert cache.hits == 0
+
+    def test_clear_resets_everything(self):
+        cache = make_cache(max_bytes=10)
+        cache.set("a", "x" * 10)
+        cache.set("b", "x" * 10)
+        cache.get("b")
+        cache.clear()
+        assert cache.stats() == {
+            "entries": 0, "bytes": 0, "max_bytes": 10,
+            "hits": 0, "stale_hits": 0, "misses": 0, "evictions": 0, "expirations": 0,
+        }
+
+
+class TestSQLiteStore:
+    """File-backed shared tier"""
+
+    def test_roundtrip_preserves_stored_at(self, tmp_path):
+        store = SQLiteStore(str(tmp_path / "pages.db"), ttl=60, clock=FakeClock())
+        store.set("a", b"blob", stored_at=990.0)
+        assert store.get("a") == (b"blob", 990.0)
+        assert store.get("missing") is None
+
+    def test_shared_between_instances(self, tmp_path):
+        path = str(tmp_path / "pages.db")
+        writer = SQLiteStore(path, ttl=60, clock=FakeClock())
+        reader = SQLiteStore(path, ttl=60, clock=FakeClock())
+        writer.set("a", b"blob")
+        assert reader.get("a") == (b"blob", 1000.0)
+
+    def test_expired_entries_are_dropped(self, tmp_path):
+        clock = FakeClock()
+        store = SQLiteStore(str(tmp_path / "pages.db"), ttl=60, clock=clock)
+        store.set("a", b"old")
+        store.set("b", b"new", stored_at=clock.now + 30)
+        clock.now += 61
+        assert store.get("a") is None
+        assert len(store) == 1
+        clock.now += 30
+        assert store.purge_expired() == 1
+        assert len(store) == 0
+
+    def test_replace_and_delete(self, tmp_path):
+        store = SQLiteStore(str(tmp_path / "pages.db"), ttl=60, clock=FakeClock())
+        store.set("a", b"one")
+        store.set("a", b"two")
+        assert store.get("a")[0] == b"two"
+        store.delete("a")
+        assert store.get("a") is None
+
+
+class TestSnapshot:
+    """Binary snapshot files"""
+
+    def test_roundtrip_keeps_order_and_metadata(self, tmp_path):
+        path = str(tmp_path / "cache.snapshot")
+        records = [SnapshotRecord("Ünïcode_Slug", b"\x00blob", 990.5, 3), SnapshotRecord("b", b"", 1000.0, 0)]
+        assert write_snapshot(path, iter(records)) == 2
+        assert list(read_snapshot(path)) == records
+
+    def test_truncated_tail_is_ignored(self, tmp_path):
+        path = tmp_path / "cache.snapshot"
+        write_snapshot(str(path), [SnapshotRecord("a", b"one", 1.0, 0), SnapshotRecord("b", b"two", 2.0, 0)])
+        path.write_bytes(path.read_bytes()[:-2])
+        assert [record.key for record in read_snapshot(str(path))] == ["a"]
+
+    def test_overlapping_writers_each_replace_whole_file(self, tmp_path):
+        """Workers stopping together each write a complete snapshot; the last one to finish wins"""
+        path = str(tmp_path / "cache.snapshot")
+        other = [SnapshotRecord("other", b"x", 1.0, 0)]
+
+        def records():
+            yield SnapshotRecord("a", b"one", 1.0, 0)
+            write_snapshot(path, other)  # Another worker writes while this one is mid-file
+            yield SnapshotRecord("b", b"two", 2.0, 0)
+
+        assert write_snapshot(path, records()) == 2
+        assert [record.key for record in read_snapshot(path)] == ["a", "b"]
+        assert os.listdir(tmp_path) == ["cache.snapshot"]
+
+    def test_rejects_other_files(self, tmp_path):
+        path = tmp_path / "not-a-snapshot"
+        path.write_bytes(b"{}")
+        with pytest.raises(ValueError):
+            list(read_snapshot(str(path)))
@@ -0,0 +1,60 @@
+"""
+Tests for Accept-Encoding negotiation and the response encoders
+"""
+import gzip
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+# Add parent directory to path to import content_encoding
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from content_encoding import ZSTD_AVAILABLE, compress, negotiate, parse_accept_encoding
+
+OFFERED = ["br", "zstd", "gzip"]
+
+
+class TestNegotiation:
+    """The client's preferences win; ties go to the server's order"""
+
+    def test_no_header_means_identity(self):
+        assert negotiate(None, OFFERED) is None
+        assert negotiate("", OFFERED) is None
+
+    def test_server_preference_breaks_ties(self):
+        assert negotiate("gzip, deflate, br, zstd", OFFERED) == "br"
+        assert negotiate("gzip, deflate", OFFERED) == "gzip"
+
+    def test_q_values(self):
+        assert negotiate("br;q=0.5, gzip", OFFERED) == "gzip"
+        assert negotiate("gzip;q=0, deflate", OFFERED) is None
+
+    def test_wildcard_covers_unlisted_codings(self):
+        assert negotiate("*", OFFERED) == "br"
+        assert negotiate("br;q=0, *;q=0.8", OFFERED) == "zstd"
+
+    def test_only_offered_codings(self):
+        assert negotiate("br, gzip", ["gzip"]) == "gzip"
+        assert negotiate("br", []) is None
+
+    def test_malformed_q_rules_coding_out(self):
+        assert parse_accept_encoding("gzip;q=abc, br; q=0.3") == {"gzip": 0.0, "br": 0.3}
+
+
+class TestEncoders:
+    def test_gzip_round_trip_is_deterministic(self):
+        body = b'{"content_text": "' + b"lorem ipsum " * 500 + b'"}'
+        compressed = compress(body, "gzip")
+        assert gzip.decompress(compressed) == body
+        assert compress(body, "gzip") == compressed  # No timestamp in the header
+
+    @pytest.mark.skipif(not ZSTD_AVAILABLE, reason="zstandard not installed")
+    def test_zstd_safe_across_threads(self):
+        import zstandard
+
+        bodies = [b'{"content_text": "' + f"page {i} ".encode() * 20000 + b'"}' for i in range(32)]
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            compressed = list(pool.map(lambda body: compress(body, "zstd"), bodies))
+        decompressor = zstandard.ZstdDecompressor()
+        assert [decompressor.decompress(c) for c in compressed] == bodies
@@ -0,0 +1,124 @@
+"""
+Parity tests for the HTML extraction engines against saved Grokipedia pages,
+and tests for the parse worker pool
+"""
+import pytest
+import sys
+from pathlib import Path
+
+# Add parent directory to path to import extraction
+sys.path.insert(0, str(Path(__file__).parent.parent))
+import asyncio
+from extraction import ENGINES, ParsePool, parse_html
+
+FIXTURES = sorted((Path(__file__).parent / "fixtures" / "grokipedia").glob("*.html"))
+
+EDGE_CASES = [
+    "",
+    "   ",
+    "<!-- only a comment -->",
+    "<p>split<!-- comment -->text</p>",
+    "<html><head><title>Head title</title></head><p>No body tag</p></html>",
+    "<html><head><title>Head title</title></head><body><p>Body tag</p></body></html>",
+    "<article class='prose'><h1>T<sup>1</sup></h1><p>x<sup>[1<sup>a</sup>]</sup>y</p></article>",
+    "<article class='prose'><ruby>漢<rt>kan</rt></ruby><template><p>hidden</p></template>tail</article>",
+    "<div id='references'><ul><li><a href='/x'>r</a><a href='//y.example'>y</a></li><li>none</li></ul></div>",
+    "<ol class='Reference-list extra'><li><a href='http://a.example'>a</a></li></ol>",
+    # Text either side of a removed tag stays two separate strings
+    "<article class='prose'><p>Before <aside>note</aside> after</p></article>",
+    "<article class='prose'><div>Intro<nav>x</nav>Body</div></article>",
+    "<article class='prose'><h1>Title <style>h1 {}</style> Extra</h1><p>Text</p></article>",
+    "<article class='prose'><h1>Title<style>h1 {}</style>Extra</h1></article>",
+    # Content, titles and references inside removed tags don't count
+    "<nav><article class='prose'><h1>Menu</h1></article></nav><main><p>Main</p></main>",
+    "<article class='prose'><header><h1>Site</h1></header><h1>Page</h1></article>",
+    "<aside><div id='references'><ol><li><a href='http://x.example'>x</a></li></ol></div></aside>"
+    "<ol class='references'><li><a href='http://a.example'>a</a><nav><a href='http://n.example'>n</a></nav></li>"
+    "<footer><li><a href='http://f.example'>f</a></li></footer></ol>",
+]
+
+
+requires_lxml = pytest.mark.skipif("lxml" not in ENGINES, reason="lxml not installed")
+
+
+@requires_lxml
+@pytest.mark.parametrize("fixture", FIXTURES, ids=lambda p: p.name)
+def test_lxml_matches_bs4_on_fixtures(fixture):
+    html = fixture.read_text(encoding="utf-8")
+    slug = fixture.stem
+    assert parse_html(html, slug, "lxml") == parse_html(html, slug, "bs4")
+
+
+@requires_lxml
+@pytest.mark.parametrize("html", EDGE_CASES)
+def test_lxml_matches_bs4_on_edge_cases(html):
+    assert parse_html(html, "Edge_Case", "lxml") == parse_html(html, "Edge_Case", "bs4")
+
+
+@requires_lxml
+@pytest.mark.parametrize("fixture", FIXTURES, ids=lambda p: p.name)
+def test_rendered_views_identical(fixture):
+    """Every Page variant served from either engine is byte-identical"""
+    from main import Article, render_page
+
+    html = fixture.read_text(encoding="utf-8")
+    views = {}
+    for engine in ENGINES:
+        parsed = parse_html(html, fixture.stem, engine)
+        article = Article(
+            title=parsed.title, slug=fixture.stem, url="https://grokipedia.com/page/x",
+            content_text=parsed.content_text,
+            reference_urls=parsed.reference_urls,
+        )
+        views[engine] = [
+            render_page(article, extract_refs, truncate, citations).model_dump_json()
+            for extract_refs in (True, False) for truncate in (None, 200) for citations in (True, False)
+        ]
+    assert views["lxml"] == views["bs4"]
+
+
+def test_fixtures_have_content():
+    """Guard against the corpus silently parsing to nothing"""
+    assert FIXTURES
+    for fixture in FIXTURES:
+        parsed = parse_html(fixture.read_text(encoding="utf-8"), fixture.stem, "bs4")
+        assert parsed.content_text
+        assert parsed.reference_urls
+
+
+class TestParsePool:
+    """Parsing off the event loop returns the same result as parsing inline"""
+
+    @pytest.mark.parametrize("mode", ParsePool.MODES)
+    def test_modes_match_inline_parse(self, mode):
+        fixture = FIXTURES[0]
+        html = fixture.read_text(encoding="utf-8")
+        pool = ParsePool(mode, workers=2)
+        try:
+            parsed = asyncio.run(pool.parse(html.encode("utf-8"), "utf-8", fixture.stem))
+        finally:
+            pool.shutdown()
+        assert parsed == parse_html(html, fixture.stem)
+        stats = pool.stats()
+        assert stats["completed"] == 1
+        assert stats["pending"] == 0
+        assert stats["failed"] == 0
+
+    def test_tracks_queue_depth(self):
+        html = FIXTURES[0].read_text(encoding="utf-8").encode("utf-8")
+        pool = ParsePool("thread", workers=1)
+
+        async def parse_many():
+            return await asyncio.gather(*[pool.parse(html, "utf-8", "Slug") for _ in range(5)])
+
+        try:
+            results = asyncio.run(parse_many())
+        finally:
+            pool.shutdown()
+        assert all(result == results[0] for result in results)
+        assert pool.stats()["max_pending"] == 5
+        assert pool.stats()["completed"] == 5
+
+    def test_rejects_unknown_mode(self):
+        with pytest.raises(ValueError):
+            ParsePool("gpu")
@@ -0,0 +1,127 @@
+"""
+Tests for the queued logging setup and sampled request logs
+"""
+import json
+import logging
+import logging.handlers
+import sys
+from pathlib import Path
+
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+# Add parent directory to path to import log_config
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from log_config import JsonFormatter, RequestLogMiddleware, configure_logging
+from timing import ServerTimingMiddleware, server_timing
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+@pytest.fixture
+def request_logger():
+    logger = logging.getLogger("test.requests")
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    handler = ListHandler()
+    logger.addHandler(handler)
+    yield logger, handler.records
+    logger.removeHandler(handler)
+
+
+def make_app(logger, sample_rate):
+    async def ok(request):
+        with server_timing("fetch"):
+            pass
+        return PlainTextResponse("ok")
+
+    async def broken(request):
+        return PlainTextResponse("boom", status_code=503)
+
+    app = Starlette(routes=[Route("/ok", ok), Route("/broken", broken)])
+    app = RequestLogMiddleware(app, sample_rate=sample_rate, logger=logger)
+    return ServerTimingMiddleware(app, profile_secret=lambda: None)
+
+
+def get(app, path):
+    return TestClient(app).get(path)
+
+
+class TestJsonFormatter:
+    """JSON lines carry the standard fields plus anything passed as extra"""
+
+    def test_extra_fields_are_top_level(self):
+        record = logging.LogRecord("api", logging.INFO, __file__, 1, "GET %s", ("/page/A",), None)
+        record.status = 200
+        entry = json.loads(JsonFormatter().format(record))
+        assert entry["level"] == "INFO"
+        assert entry["logger"] == "api"
+        assert entry["message"] == "GET /page/A"
+        assert entry["status"] == 200
+        assert "args" not in entry and "msecs" not in entry
+
+
+class TestQueuedLogging:
+    """Records are handed to a background writer thread"""
+
+    def test_records_reach_stdout_through_queue(self, capsys):
+        root = logging.getLogger()
+        level = root.level
+        listener = configure_logging("INFO", "json")
+        try:
+            logging.getLogger("queued").info("hello %s", "world", extra={"slug": "A"})
+            listener.stop()  # Drains the queue
+            lines = capsys.readouterr().out.splitlines()
+            entry = json.loads(lines[-1])
+            assert entry["message"] == "hello world"
+            assert entry["slug"] == "A"
+        finally:
+            for handler in list(root.handlers):
+                if isinstance(handler, logging.handlers.QueueHandler):
+                    root.removeHandler(handler)
+            root.setLevel(level)
+
+    def test_records_below_level_are_dropped(self, capsys):
+        root = logging.getLogger()
+        level = root.level
+        listener = configure_logging("WARNING")
+        try:
+            logging.getLogger("queued").info("hidden")
+            logging.getLogger("queued").warning("shown")
+            listener.stop()
+            out = capsys.readouterr().out
+            assert "shown" in out and "hidden" not in out
+        finally:
+            for handler in list(root.handlers):
+                if isinstance(handler, logging.handlers.QueueHandler):
+                    root.removeHandler(handler)
+            root.setLevel(level)
+
+
+class TestRequestLog:
+    """A sample of requests, and every server error, get a structured record"""
+
+    def test_sampled_request_includes_stages(self, request_logger):
+        logger, records = request_logger
+        assert get(make_app(logger, 1.0), "/ok").status_code == 200
+        [record] = records
+        assert (record.method, record.path, record.status) == ("GET", "/ok", 200)
+        assert record.duration_ms >= 0
+        assert "fetch" in record.stages_ms
+
+    def test_unsampled_requests_only_log_server_errors(self, request_logger):
+        logger, records = request_logger
+        get(make_app(logger, 0), "/ok")
+        assert records == []
+        get(make_app(logger, 0), "/broken")
+        assert [record.status for record in records] == [503]
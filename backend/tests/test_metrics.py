@@ -0,0 +1,61 @@
+"""
+Tests for the Prometheus metrics primitives
+"""
+import sys
+from pathlib import Path
+
+# Add parent directory to path to import metrics
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from metrics import Registry
+
+
+class TestExposition:
+    """Metrics render in the Prometheus text format"""
+
+    def test_counter_with_labels(self):
+        registry = Registry()
+        counter = registry.counter("requests_total", "Requests", ["status"])
+        counter.inc(status="200")
+        counter.inc(2, status="404")
+        assert registry.render() == (
+            "# HELP requests_total Requests\n"
+            "# TYPE requests_total counter\n"
+            'requests_total{status="200"} 1\n'
+            'requests_total{status="404"} 2\n'
+        )
+
+    def test_callback_gauge_read_at_scrape_time(self):
+        registry = Registry()
+        items = []
+        registry.gauge("items", "Items", fn=lambda: len(items))
+        items.extend("abc")
+        assert "items 3\n" in registry.render()
+
+    def test_histogram_buckets_are_cumulative(self):
+        registry = Registry()
+        histogram = registry.histogram("latency_seconds", "Latency", ["stage"], buckets=(0.1, 1))
+        for value in (0.05, 0.1, 0.5, 3):
+            histogram.observe(value, stage="parse")
+        lines = registry.render().splitlines()[2:]
+        assert lines == [
+            'latency_seconds_bucket{stage="parse",le="0.1"} 2',
+            'latency_seconds_bucket{stage="parse",le="1"} 3',
+            'latency_seconds_bucket{stage="parse",le="+Inf"} 4',
+            'latency_seconds_sum{stage="parse"} 3.65',
+            'latency_seconds_count{stage="parse"} 4',
+        ]
+        assert histogram.count(stage="parse") == 4
+
+    def test_label_values_escaped(self):
+        registry = Registry()
+        registry.counter("odd_total", "Odd", ["route"]).inc(route='a"b\\c')
+        assert 'odd_total{route="a\\"b\\\\c"} 1' in registry.render()
+
+    def test_clear_keeps_callbacks(self):
+        registry = Registry()
+        counter = registry.counter("events_total", "Events")
+        registry.gauge("constant", "Constant", fn=lambda: 7)
+        counter.inc()
+        registry.clear()
+        assert counter.value() == 0
+        assert "constant 7" in registry.render()
@@ -0,0 +1,184 @@
+"""
+Tests for the sliding-window rate limiter and its shared SQLite store
+"""
+import sys
+import threading
+from pathlib import Path
+
+# Add parent directory to path to import rate_limit
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from rate_limit import SlidingWindowLimiter, SQLiteCounterStore
+
+
+class FakeClock:
+    def __init__(self, now: float = 6000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def make_limiter(limit=10, window=60, max_clients=100, clock=None):
+    return SlidingWindowLimiter(limit, window, max_clients=max_clients, clock=clock or FakeClock())
+
+
+class TestLimit:
+    """Requests beyond the limit within a window are rejected"""
+
+    def test_allows_up_to_limit(self):
+        limiter = make_limiter(limit=10)
+        assert all(limiter.hit("a") for _ in range(10))
+        assert not limiter.hit("a")
+        assert limiter.stats()["allowed"] == 10
+        assert limiter.stats()["rejected"] == 1
+
+    def test_clients_are_independent(self):
+        limiter = make_limiter(limit=2)
+        limiter.hit("a")
+        limiter.hit("a")
+        assert not limiter.hit("a")
+        assert limiter.hit("b")
+
+    def test_cost_charges_several_requests(self):
+        limiter = make_limiter(limit=10)
+        assert limiter.hit("a", cost=7)
+        assert limiter.count("a") == 7
+        assert not limiter.hit("a", cost=4)  # Only 3 left: rejected whole, not counted
+        assert limiter.count("a") == 7
+        assert limiter.retry_after("a", cost=4) > 0
+        assert limiter.hit("a", cost=3)
+        assert not limiter.hit("a")
+
+    def test_rejected_requests_are_not_counted(self):
+        limiter = make_limiter(limit=2)
+        for _ in range(50):
+            limiter.hit("a")
+        assert limiter.count("a") == 2
+
+
+class TestSlidingWindow:
+    """The previous window still counts in proportion to its overlap"""
+
+    def test_previous_window_weighted_by_overlap(self):
+        clock = FakeClock(6000.0)  # Start of a window
+        limiter = make_limiter(limit=10, clock=clock)
+        for _ in range(10):
+            limiter.hit("a")
+        clock.now += 60 + 15  # A quarter into the next window: 7.5 still count
+        assert limiter.count("a") == 7.5
+        assert all(limiter.hit("a") for _ in range(3))  # Allowed at 7.5, 8.5 and 9.5
+        assert not limiter.hit("a")
+        assert limiter.retry_after("a") == 3  # The old share drops by 1/6 per second
+
+    def test_limit_is_not_reset_at_window_boundary(self):
+        clock = FakeClock(6059.0)  # One second before the window ends
+        limiter = make_limiter(limit=10, clock=clock)
+        for _ in range(10):
+            limiter.hit("a")
+        clock.now += 1.2  # Just into the next window: 9.97 still count
+        assert limiter.hit("a")
+        assert not limiter.hit("a")
+        assert limiter.retry_after("a") == 6
+
+    def test_counts_reset_after_two_windows(self):
+        clock = FakeClock()
+        limiter = make_limiter(limit=1, clock=clock)
+        limiter.hit("a")
+        clock.now += 120
+        assert limiter.hit("a")
+        assert limiter.retry_after("b") == 0
+
+
+class TestMemoryBound:
+    """Idle clients are dropped and the number of tracked clients is capped"""
+
+    def test_idle_clients_evicted(self):
+        clock = FakeClock()
+        limiter = make_limiter(clock=clock)
+        for i in range(50):
+            limiter.hit(f"10.0.0.{i}")
+        clock.now += 60
+        limiter.hit("active")
+        assert len(limiter) == 51
+        clock.now += 60.001
+        limiter.hit("active")
+        assert len(limiter) == 1
+        assert limiter.stats()["idle_evictions"] == 50
+
+    def test_client_cap_evicts_least_recently_seen(self):
+        limiter = make_limiter(max_clients=3)
+        for key in ("a", "b", "c"):
+            limiter.hit(key)
+        limiter.hit("a")
+        limiter.hit("d")
+        assert len(limiter) == 3
+        assert limiter.count("b") == 0
+        assert limiter.count("a") == 2
+        assert limiter.stats()["capacity_evictions"] == 1
+
+    def test_clear(self):
+        limiter = make_limiter()
+        limiter.hit("a")
+        limiter.clear()
+        assert len(limiter) == 0
+        assert limiter.stats()["allowed"] == 0
+
+
+class TestSharedStore:
+    """Counts are shared between limiters (workers) through a SQLite file"""
+
+    def test_store_adds_atomically_across_connections(self, tmp_path):
+        path = str(tmp_path / "limits.db")
+        stores = [SQLiteCounterStore(path) for _ in range(4)]
+
+        def add_many(store):
+            for _ in range(50):
+                store.add({"a": 1, "b": 2}, window=100)
+
+        threads = [threading.Thread(target=add_many, args=(store,)) for store in stores]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert stores[0].add({"a": 0}, window=100) == {"a": (0, 200)}
+        assert stores[0].add({"b": 1}, window=101) == {"b": (400, 1)}
+
+    def test_old_windows_purged(self, tmp_path):
+        store = SQLiteCounterStore(str(tmp_path / "limits.db"))
+        store.add({"a": 1}, window=100)
+        store.add({"a": 1}, window=101)
+        store.add({"b": 1}, window=102)
+        assert len(store) == 2  # a@101 and b@102
+
+    def test_limit_enforced_across_workers(self, tmp_path):
+        clock = FakeClock()
+        path = str(tmp_path / "limits.db")
+        workers = [
+            SlidingWindowLimiter(10, 60, clock=clock, store=SQLiteCounterStore(path), flush_interval=1)
+            for _ in range(2)
+        ]
+        for _ in range(6):
+            assert workers[0].hit("a")
+        workers[0].flush()
+        assert workers[1].hit("a")
+        workers[1].flush()  # Learns worker 0's six requests
+        assert all(workers[1].hit("a") for _ in range(3))
+        assert not workers[1].hit("a")
+        workers[1].flush()
+        # Worker 0 only learns the shared total when it next flushes "a"
+        assert workers[0].hit("a")
+        workers[0].flush()
+        assert workers[0].count("a") == 11
+        assert not workers[0].hit("a")
+
+    def test_hit_flushes_when_interval_elapsed(self, tmp_path):
+        clock = FakeClock()
+        store = SQLiteCounterStore(str(tmp_path / "limits.db"))
+        limiter = SlidingWindowLimiter(10, 60, clock=clock, store=store, flush_interval=1)
+        limiter.hit("a")
+        assert len(store) == 0
+        clock.now += 1
+        limiter.hit("a")
+        assert len(store) == 1
+        assert limiter.stats()["flushes"] == 1
+        assert store.add({"a": 0}, window=100) == {"a": (0, 2)}
@@ -0,0 +1,78 @@
+"""
+Tests for the cache warm-up sources and runner
+"""
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add parent directory to path to import warmup
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from warmup import read_hit_counts, read_seed_topics, read_slug_file, unique, warm, write_hit_counts
+
+
+class TestSources:
+    """Slug lists from files"""
+
+    def test_seed_topics_array_only(self, tmp_path):
+        path = tmp_path / "seed-topics.ts"
+        path.write_text(
+            "export const seedTopics = [\n  'Elon Musk',\n  \"COVID-19\",\n];\n"
+            "export const categories = [{ topics: ['Tesla'] }];\n"
+        )
+        assert read_seed_topics(path) == ["Elon Musk", "COVID-19"]
+
+    def test_frontend_seed_topics(self):
+        topics = read_seed_topics()
+        assert "Bitcoin" in topics
+        assert len(topics) == len(set(topics))
+
+    def test_slug_file_skips_blanks_and_comments(self, tmp_path):
+        path = tmp_path / "slugs.txt"
+        path.write_text("# Popular\nAlpha\n\n  Beta  \n")
+        assert read_slug_file(str(path)) == ["Alpha", "Beta"]
+
+    def test_hit_counts_round_trip_most_requested_first(self, tmp_path):
+        path = str(tmp_path / "hits.json")
+        write_hit_counts(path, {"Rare": 1, "Popular": 40, "Common": 7}, limit=2)
+        assert read_hit_counts(path) == ["Popular", "Common"]
+
+    def test_hit_counts_written_through_own_temp_file(self, tmp_path):
+        """Another worker's in-progress write is left alone, and a failed write leaves no litter"""
+        path = str(tmp_path / "hits.json")
+        other = tmp_path / "hits.json.tmp"
+        other.write_text("{}")
+        write_hit_counts(path, {"Popular": 40}, limit=10)
+        assert other.read_text() == "{}"
+        with pytest.raises(TypeError):
+            write_hit_counts(path, {"Broken": object()}, limit=10)
+        assert read_hit_counts(path) == ["Popular"]
+        assert sorted(p.name for p in tmp_path.iterdir()) == ["hits.json", "hits.json.tmp"]
+
+    def test_unique_keeps_first_occurrence(self):
+        assert unique(["B", "A", "B", "C", "A"]) == ["B", "A", "C"]
+
+
+class TestWarm:
+    """Slugs are loaded at bounded concurrency and failures don't stop the run"""
+
+    def test_bounded_concurrency_and_failures(self):
+        running = peak = 0
+        loaded = []
+
+        async def load(slug):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            if slug == "Broken":
+                raise ValueError("no such page")
+            loaded.append(slug)
+
+        slugs = [f"Slug_{i}" for i in range(10)] + ["Broken"]
+        stats = asyncio.run(warm(slugs, load, concurrency=3))
+        assert peak == 3
+        assert sorted(loaded) == sorted(slugs[:-1])
+        assert (stats["slugs"], stats["loaded"], stats["failed"]) == (11, 10, 1)
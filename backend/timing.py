@@ -0,0 +1,124 @@
+"""
+Per-request stage timings reported in a Server-Timing header, and an opt-in
+cProfile mode for a single request.
+"""
+import asyncio
+import cProfile
+import io
+import pstats
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+
+# Stage name -> seconds for the current request. A mutable dict so that work
+# done in tasks started by the request (which copy the context) still lands in it.
+_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("server_timings", default=None)
+
+PROFILE_HEADER = "X-Profile-Key"
+PROFILE_LINES = 60
+
+
+def record(name: str, seconds: float):
+    """Add ``seconds`` to stage ``name`` of the current request (no-op outside a request)"""
+    timings = _timings.get()
+    if timings is not None:
+        timings[name] = timings.get(name, 0.0) + seconds
+
+
+def current_timings() -> Optional[Dict[str, float]]:
+    """Stages recorded so far for the current request"""
+    return _timings.get()
+
+
+def stop_recording():
+    """Stop recording into the request's timings from the current task (e.g. background work it started)"""
+    _timings.set(None)
+
+
+@contextmanager
+def server_timing(name: str):
+    """Time the block as stage ``name``; repeated stages (e.g. in batches) add up"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start)
+
+
+def format_server_timing(timings: Dict[str, float]) -> str:
+    return ", ".join(f"{name};dur={seconds * 1000:.2f}" for name, seconds in timings.items())
+
+
+class ServerTimingMiddleware:
+    """ASGI middleware adding a Server-Timing header with the stages recorded for each request.
+
+    A request carrying ``X-Profile-Key`` equal to ``profile_secret()`` is run
+    under cProfile and answered with the profile (text, top functions by
+    cumulative time) instead of its normal body. The profiler sees everything
+    the event loop thread runs meanwhile, so use it on a quiet worker; work in
+    the parse process pool only shows up as time spent waiting.
+    """
+
+    def __init__(self, app, profile_secret: Callable[[], Optional[str]]):
+        self.app = app
+        self.profile_secret = profile_secret
+        self._profiling = asyncio.Lock()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        timings: Dict[str, float] = {}
+        token = _timings.set(timings)
+        start = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                timings["total"] = time.perf_counter() - start
+                MutableHeaders(scope=message).append("Server-Timing", format_server_timing(timings))
+            await send(message)
+
+        try:
+            secret = self.profile_secret()
+            if secret and Headers(scope=scope).get(PROFILE_HEADER) == secret:
+                await self._profile(scope, receive, send, timings, start)
+            else:
+                await self.app(scope, receive, send_with_timing)
+        finally:
+            _timings.reset(token)
+
+    async def _profile(self, scope, receive, send, timings: Dict[str, float], start: float):
+        if self._profiling.locked():  # Only one profiler can be active at a time
+            await _send_text(send, 409, "Another request is being profiled\n", {})
+            return
+        async with self._profiling:
+            status = 500
+
+            async def capture(message):
+                nonlocal status
+                if message["type"] == "http.response.start":
+                    status = message["status"]
+
+            profiler = cProfile.Profile()
+            profiler.enable()
+            try:
+                await self.app(scope, receive, capture)
+            finally:
+                profiler.disable()
+            timings["total"] = time.perf_counter() - start
+
+        out = io.StringIO()
+        out.write(f"Response status: {status}\nServer-Timing: {format_server_timing(timings)}\n\n")
+        pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(PROFILE_LINES)
+        await _send_text(send, 200, out.getvalue(), {"Server-Timing": format_server_timing(timings)})
+
+
+async def _send_text(send, status: int, text: str, headers: Dict[str, str]):
+    body = text.encode("utf-8")
+    raw_headers = [(b"content-type", b"text/plain; charset=utf-8"), (b"content-length", str(len(body)).encode())]
+    raw_headers += [(name.lower().encode(), value.encode()) for name, value in headers.items()]
+    await send({"type": "http.response.start", "status": status, "headers": raw_headers})
+    await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Cache warm-up: prefetch popular pages so a fresh deploy doesn't start cold.
+
+Slugs come from one or more sources, in order, de-duplicated and capped:
+
+- ``hits``: per-slug hit counts saved by the previous run (HIT_COUNTS_FILE)
+- ``seed-topics``: the frontend's featured topics (frontend/lib/seed-topics.ts)
+- ``topic-mappings``: curated slugs from the Supabase topic_mappings table
+- ``file``: a text file with one slug per line (WARMUP_SLUGS_FILE)
+
+The API runs this at startup when WARMUP_SOURCES is set. As a command it
+fills the shared cache tier (PAGE_CACHE_DB), which every worker reads
+through on a miss:
+
+    python warmup.py [--sources hits,seed-topics] [--limit 500] [--concurrency 4]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import re
+import time
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, Iterable, List
+
+from cache import atomic_write
+
+logger = logging.getLogger(__name__)
+
+SEED_TOPICS_PATH = Path(__file__).parent.parent / "frontend" / "lib" / "seed-topics.ts"
+SOURCES = ("hits", "seed-topics", "topic-mappings", "file")
+
+_SEED_TOPICS_RE = re.compile(r"seedTopics\s*=\s*\[(.*?)\]", re.DOTALL)
+_STRING_RE = re.compile(r"""'((?:[^'\\]|\\.)*)'|"((?:[^"\\]|\\.)*)\"""")
+
+
+def read_seed_topics(path: Path = SEED_TOPICS_PATH) -> List[str]:
+    """Topics listed in the frontend's ``seedTopics`` array"""
+    match = _SEED_TOPICS_RE.search(path.read_text(encoding="utf-8"))
+    if match is None:
+        return []
+    return [single or double for single, double in _STRING_RE.findall(match.group(1))]
+
+
+def read_slug_file(path: str) -> List[str]:
+    """One slug per line; blank lines and ``#`` comments are skipped"""
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith("#")]
+
+
+def read_hit_counts(path: str) -> List[str]:
+    """Slugs from a hit-count snapshot, most requested first"""
+    with open(path, encoding="utf-8") as f:
+        counts: Dict[str, int] = json.load(f)
+    return sorted(counts, key=counts.get, reverse=True)
+
+
+def write_hit_counts(path: str, counts: Dict[str, int], limit: int):
+    """Save the ``limit`` most requested slugs, replacing the file atomically"""
+    top = dict(sorted(counts.items(), key=lambda item: item[1], reverse=True)[:limit])
+    with atomic_write(path, "w", encoding="utf-8") as f:
+        json.dump(top, f)
+
+
+def unique(slugs: Iterable[str]) -> List[str]:
+    return list(dict.fromkeys(slugs))
+
+
+async def warm(slugs: List[str], load: Callable[[str], Awaitable[object]], concurrency: int) -> Dict[str, float]:
+    """Call ``load(slug)`` for every slug, at most ``concurrency`` at a time.
+
+    A failing slug is logged and counted; it doesn't stop the rest.
+    """
+    pending = iter(slugs)
+    loaded = failed = 0
+    started = time.perf_counter()
+
+    async def worker():
+        nonlocal loaded, failed
+        for slug in pending:
+            try:
+                await load(slug)
+                loaded += 1
+            except Exception as e:
+                failed += 1
+                logger.warning(f"Warm-up failed for {slug}: {getattr(e, 'detail', None) or str(e)}")
+
+    await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+    return {"slugs": len(slugs), "loaded": loaded, "failed": failed,
+            "seconds": round(time.perf_counter() - started, 2)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sources", default=os.getenv("WARMUP_SOURCES") or "hits,seed-topics",
+                        help=f"comma-separated, from: {', '.join(SOURCES)}")
+    parser.add_argument("--limit", type=int, help="most slugs to load (default WARMUP_LIMIT)")
+    parser.add_argument("--concurrency", type=int, help="parallel loads (default WARMUP_CONCURRENCY)")
+    args = parser.parse_args()
+
+    import main as api  # Imported here because the app imports this module
+
+    if not api.PAGE_CACHE_DB:
+        parser.error("PAGE_CACHE_DB must be set: this command fills the shared cache tier")
+    sources = [source.strip() for source in args.sources.split(",") if source.strip()]
+
+    async def run():
+        try:
+            return await api.warm_up(sources, args.limit or api.WARMUP_LIMIT,
+                                     args.concurrency or api.WARMUP_CONCURRENCY)
+        finally:
+            await api.close_http_client()
+
+    stats = asyncio.run(run())
+    api.parse_pool.shutdown()
+    print(json.dumps(stats))
+
+
+if __name__ == "__main__":
+    main()